@@ -0,0 +1,124 @@
+import os
+
+# Configuración centralizada. Todos los valores se pueden sobrescribir por variable de entorno.
+
+# Pool de navegadores Chromium
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_CONTEXTS_PER_BROWSER = int(os.getenv("MAX_CONTEXTS_PER_BROWSER", "4"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1") != "0"
+# Vigilancia de memoria: un navegador se recicla (se lanza otro y el viejo se cierra cuando
+# terminan sus scrapes) tras N scrapes, al superar un RSS (árbol de procesos) o por edad. 0 = sin límite
+BROWSER_RECYCLE_AFTER_SCRAPES = int(os.getenv("BROWSER_RECYCLE_AFTER_SCRAPES", "200"))
+BROWSER_RECYCLE_MAX_RSS_MB = int(os.getenv("BROWSER_RECYCLE_MAX_RSS_MB", "1500"))
+BROWSER_RECYCLE_MAX_AGE = int(os.getenv("BROWSER_RECYCLE_MAX_AGE", "3600"))
+BROWSER_WATCHDOG_INTERVAL = float(os.getenv("BROWSER_WATCHDOG_INTERVAL", "15"))
+# Páginas abiertas a la vez por contexto (la principal + documentos en paralelo); las demás se cierran
+BROWSER_MAX_PAGES_PER_CONTEXT = int(os.getenv("BROWSER_MAX_PAGES_PER_CONTEXT", "6"))
+
+# Caché de resultados (LRU en memoria + SQLite en disco), TTL en segundos
+DATA_DIR = os.getenv("DATA_DIR", "data")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(DATA_DIR, "result_cache.sqlite3"))
+RESULT_CACHE_MEMORY_SIZE = int(os.getenv("RESULT_CACHE_MEMORY_SIZE", "5000"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_NO_RESULTS_TTL = int(os.getenv("RESULT_CACHE_NO_RESULTS_TTL", str(6 * 3600)))
+RESULT_CACHE_ERROR_TTL = int(os.getenv("RESULT_CACHE_ERROR_TTL", "300"))
+
+# Lotes: número máximo de CAS que se scrapean en paralelo (compartido entre todos los lotes)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+
+# Filtrado de peticiones de red durante el scraping
+REQUEST_FILTER_ENABLED = os.getenv("REQUEST_FILTER_ENABLED", "1") != "0"
+REQUEST_FILTER_RESOURCE_TYPES = [
+    t.strip() for t in os.getenv("REQUEST_FILTER_RESOURCE_TYPES", "image,font,media").split(",") if t.strip()
+]
+REQUEST_FILTER_URL_PATTERNS = [
+    p.strip() for p in os.getenv("REQUEST_FILTER_URL_PATTERNS", "").split(",") if p.strip()
+]
+
+# Sitio de ECHA (se puede apuntar a un servidor local que reproduzca respuestas grabadas)
+ECHA_BASE_URL = os.getenv("ECHA_BASE_URL", "https://chem.echa.europa.eu").rstrip("/")
+
+# Motor HTTP sin navegador (endpoints JSON de ECHA) con fallback a Playwright
+HTTP_ENGINE_ENABLED = os.getenv("HTTP_ENGINE_ENABLED", "1") != "0"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+# Si se indica, cada respuesta del motor HTTP se graba en este directorio para reproducirla después
+HTTP_RECORD_DIR = os.getenv("HTTP_RECORD_DIR", "")
+
+# Estado del navegador (cookies/localStorage) con el aviso legal ya aceptado
+LEGAL_NOTICE_STATE_PATH = os.getenv("LEGAL_NOTICE_STATE_PATH", os.path.join(DATA_DIR, "legal_notice_state.json"))
+LEGAL_NOTICE_STATE_TTL = int(os.getenv("LEGAL_NOTICE_STATE_TTL", str(12 * 3600)))
+# Búsqueda directa por URL cuando el aviso ya está aceptado
+SEARCH_URL_TEMPLATE = os.getenv("SEARCH_URL_TEMPLATE", "{base_url}/substance-search?searchText={cas_code}")
+
+# Índice de navegación: URLs intermedias (sustancia, registros, dossier Lead) por CAS
+NAV_INDEX_PATH = os.getenv("NAV_INDEX_PATH", os.path.join(DATA_DIR, "navigation_index.sqlite3"))
+NAV_INDEX_TTL = int(os.getenv("NAV_INDEX_TTL", str(30 * 24 * 3600)))
+
+# Reintentos de run() ante fallos transitorios: cada intento usa un contexto nuevo y reanuda desde
+# el último paso completado (URLs visitadas, iframe del dossier, índice del TOC). Espera exponencial
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "2"))
+SCRAPE_RETRY_BACKOFF = float(os.getenv("SCRAPE_RETRY_BACKOFF", "2"))
+SCRAPE_RETRY_BACKOFF_MAX = float(os.getenv("SCRAPE_RETRY_BACKOFF_MAX", "30"))
+
+# Trabajos asíncronos (POST /jobs): cola persistente en SQLite y pool de workers
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "1000"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+JOBS_RETENTION = int(os.getenv("JOBS_RETENTION", str(7 * 24 * 3600)))
+
+# Exportación columnar de los resultados guardados (python -m app.services.export)
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(DATA_DIR, "exports"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+# Artefactos de los scrapes (HTML de la información clave, capturas de error), por contenido
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", os.path.join(DATA_DIR, "artifacts"))
+ARTIFACTS_MAX_BYTES = int(os.getenv("ARTIFACTS_MAX_BYTES", str(500 * 1024 * 1024)))
+ARTIFACTS_COMPRESS = os.getenv("ARTIFACTS_COMPRESS", "1") != "0"
+
+# Caché en disco de los recursos estáticos de ECHA (JS/CSS/fuentes) compartida por todos los
+# navegadores y procesos. Lo que no trae versión en el nombre ni max-age se revalida tras
+# ASSET_CACHE_REVALIDATE_AFTER segundos con ETag/Last-Modified
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE_ENABLED", "1") != "0"
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(DATA_DIR, "asset_cache"))
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+ASSET_CACHE_REVALIDATE_AFTER = int(os.getenv("ASSET_CACHE_REVALIDATE_AFTER", "300"))
+ASSET_CACHE_RESOURCE_TYPES = [
+    t.strip() for t in os.getenv("ASSET_CACHE_RESOURCE_TYPES", "script,stylesheet,font").split(",") if t.strip()
+]
+
+# Secciones toxicológicas (id del TOC de IUCLID) extraídas en la misma visita al dossier, y cuántos
+# documentos se abren a la vez en páginas adicionales del mismo contexto
+TOXICOLOGY_ENDPOINTS = [
+    s.strip() for s in os.getenv(
+        "TOXICOLOGY_ENDPOINTS",
+        "id_72_Acutetoxicity,id_75_Repeateddosetoxicity,id_77_Genetictoxicity,id_78_Toxicitytoreproduction",
+    ).split(",") if s.strip()
+]
+ENDPOINT_PAGE_CONCURRENCY = int(os.getenv("ENDPOINT_PAGE_CONCURRENCY", "3"))
+
+# Streaming de eventos (SSE / NDJSON): latido para que proxies y clientes no corten la conexión
+STREAM_HEARTBEAT_INTERVAL = float(os.getenv("STREAM_HEARTBEAT_INTERVAL", "15"))
+
+# Modo supervisor: N procesos worker con su propio event loop y navegadores; los scrapes se
+# reparten por hashing consistente del CAS. 0 = todo en el proceso de la API; "auto" = núcleos
+_worker_processes = os.getenv("SCRAPER_WORKER_PROCESSES", "0")
+SCRAPER_WORKER_PROCESSES = os.cpu_count() if _worker_processes == "auto" else int(_worker_processes)
+SHARD_BROWSERS_PER_WORKER = int(os.getenv("SHARD_BROWSERS_PER_WORKER", "1"))
+
+# Límite adaptativo hacia ECHA (por host): cubo de tokens para el ritmo de peticiones y límite de
+# scrapes simultáneos AIMD (sube de uno en uno mientras la latencia es buena, se reduce a la mitad
+# ante 429/5xx o timeouts). Los valores son el total hacia ECHA: en modo supervisor cada worker
+# recibe 1/N del ritmo, la ráfaga y los límites de concurrencia.
+UPSTREAM_LIMITER_ENABLED = os.getenv("UPSTREAM_LIMITER_ENABLED", "1") != "0"
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "5"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+UPSTREAM_CONCURRENCY_INITIAL = int(os.getenv("UPSTREAM_CONCURRENCY_INITIAL", "4"))
+UPSTREAM_CONCURRENCY_MIN = int(os.getenv("UPSTREAM_CONCURRENCY_MIN", "1"))
+UPSTREAM_CONCURRENCY_MAX = int(os.getenv("UPSTREAM_CONCURRENCY_MAX", "32"))
+# Latencia por petición (s) a partir de la cual se considera que ECHA empieza a saturarse
+UPSTREAM_LATENCY_TARGET = float(os.getenv("UPSTREAM_LATENCY_TARGET", "4"))
+# Tiempo mínimo entre dos reducciones: una ráfaga de errores de la misma oleada cuenta una sola vez
+UPSTREAM_DECREASE_COOLDOWN = float(os.getenv("UPSTREAM_DECREASE_COOLDOWN", "2"))
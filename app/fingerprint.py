@@ -0,0 +1,72 @@
+import hashlib
+import json
+import re
+
+# Huella de los registros REACH de una sustancia: rol, titular e id de cada dossier, más los
+# metadatos de fecha/versión que publique ECHA. Si no cambia, el dossier Lead tampoco y el
+# resultado guardado sigue valiendo (refresco incremental).
+#
+# Cada motor calcula la huella con lo que ve (el JSON del listado o la tabla de la página), así
+# que solo son comparables las de un mismo motor: al cambiar de motor se re-extrae una vez.
+
+METADATA_KEY = re.compile(r"date|updated|modified|version", re.IGNORECASE)
+
+
+def _metadatos(item, found=None):
+    # Valores de fecha/versión de un item del listado de dossiers, en cualquier nivel
+    found = {} if found is None else found
+    if isinstance(item, dict):
+        for key, value in item.items():
+            if isinstance(value, (dict, list)):
+                _metadatos(value, found)
+            elif METADATA_KEY.search(key) and value is not None:
+                found[key] = value
+    elif isinstance(item, list):
+        for value in item:
+            _metadatos(value, found)
+    return found
+
+
+def _buscar(item, key):
+    if isinstance(item, dict):
+        if key in item:
+            return item[key]
+        item = list(item.values())
+    if isinstance(item, list):
+        for value in item:
+            found = _buscar(value, key)
+            if found is not None:
+                return found
+    return None
+
+
+def filas_api(items):
+    # Items de /api-dossier-list (motor HTTP)
+    return [{
+        "role": _buscar(item, "registrationRole"),
+        "owner": _buscar(item, "legalEntityName"),
+        "dossier_id": _buscar(item, "assetExternalId"),
+        "updated": _metadatos(item) or None,
+    } for item in items]
+
+
+def filas_pagina(rows):
+    # Filas de la tabla de registros (Playwright): el id del dossier es el final del enlace y la
+    # fecha/versión sale de las celdas cuyo data-cy la nombra, igual que _metadatos con el JSON
+    return [{
+        "role": row.get("role"),
+        "owner": row.get("owner"),
+        "dossier_id": (row.get("href") or "").split("?")[0].rstrip("/").rsplit("/", 1)[-1] or None,
+        "updated": {k: v for k, v in (row.get("cells") or {}).items() if METADATA_KEY.search(k) and v} or None,
+    } for row in rows]
+
+
+def huella(filas):
+    filas = sorted(filas, key=lambda f: json.dumps(f, sort_keys=True, default=str))
+    lead = next((f["dossier_id"] for f in filas if "lead" in (f["role"] or "").lower()), None)
+    canonical = json.dumps(filas, sort_keys=True, default=str, ensure_ascii=False)
+    return {
+        "hash": hashlib.sha256(canonical.encode("utf-8")).hexdigest(),
+        "lead_dossier": lead,
+        "registrations": len(filas),
+    }
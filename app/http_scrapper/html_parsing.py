@@ -0,0 +1,151 @@
+from html import escape
+from html.parser import HTMLParser
+
+# Elementos sin etiqueta de cierre: no se apilan
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+KEY_INFORMATION_LABEL = "Description of key information"
+
+
+def _clases(attrs):
+    return (dict(attrs).get("class") or "").split()
+
+
+class _StackParser(HTMLParser):
+    # HTMLParser que mantiene la pila de elementos abiertos, tolerando cierres que faltan
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+
+    def _push(self, tag, attrs):
+        node = {"tag": tag, "attrs": dict(attrs), "classes": _clases(attrs)}
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+        node["depth"] = len(self.stack)
+        return node
+
+    def _pop(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["tag"] == tag:
+                closed = self.stack[i]
+                del self.stack[i:]
+                return closed
+        return None
+
+
+class TocParser(_StackParser):
+    # Lee el árbol de contenidos del visor de dossiers: cada hoja (a.das-leaf) con su docid,
+    # su href y la ruta de secciones (data-toc-target de los botones que la contienen).
+
+    def __init__(self):
+        super().__init__()
+        self.documents = []
+        self._leaf = None
+
+    def handle_starttag(self, tag, attrs):
+        node = self._push(tag, attrs)
+        if tag == "button" and node["attrs"].get("data-toc-target") and len(self.stack) > 1:
+            # El botón etiqueta al elemento que lo contiene (normalmente un <li>)
+            self.stack[-2]["section"] = node["attrs"]["data-toc-target"].lstrip("#")
+        if tag == "a" and "das-leaf" in node["classes"]:
+            docid = next((c[len("das-docid-"):] for c in node["classes"] if c.startswith("das-docid-")), None)
+            self._leaf = {
+                "docid": docid,
+                "href": node["attrs"].get("href"),
+                "sections": [n["section"] for n in self.stack if n.get("section")],
+                "title": "",
+            }
+
+    def handle_endtag(self, tag):
+        self._pop(tag)
+        if tag == "a" and self._leaf is not None:
+            self._leaf["title"] = " ".join(self._leaf["title"].split())
+            self.documents.append(self._leaf)
+            self._leaf = None
+
+    def handle_data(self, data):
+        if self._leaf is not None:
+            self._leaf["title"] += data
+
+
+class KeyInformationParser(_StackParser):
+    # Extrae el HTML y el texto de ".das-field_value_html" de la sección "Description of key information"
+
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+        self._block = None
+        self._label_depth = None
+        self._value_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        node = self._push(tag, attrs)
+        depth = node["depth"]
+
+        if self._value_depth is not None:
+            attr_text = "".join(f' {k}="{escape(v or "", quote=True)}"' for k, v in attrs)
+            self._block["html"] += f"<{tag}{attr_text}>"
+            if tag in ("br", "p", "div", "li", "tr"):
+                self._block["text"] += "\n"
+            return
+
+        if tag == "section" and "das-block" in node["classes"]:
+            self._block = {"classes": node["classes"], "label": "", "html": "", "text": "",
+                           "has_value": False, "depth": depth}
+            self.blocks.append(self._block)
+        elif self._block is not None:
+            if tag == "h3" and "das-block_label" in node["classes"]:
+                self._label_depth = depth
+            elif "das-field_value_html" in node["classes"] and not self._block["has_value"]:
+                self._block["has_value"] = True
+                self._value_depth = depth
+
+    def handle_endtag(self, tag):
+        closed = self._pop(tag)
+        if closed is None:
+            return
+        depth = closed["depth"]
+
+        if self._value_depth is not None:
+            if depth <= self._value_depth:
+                self._value_depth = None
+            else:
+                self._block["html"] += f"</{tag}>"
+            return
+
+        if self._label_depth is not None and depth <= self._label_depth:
+            self._label_depth = None
+        if self._block is not None and depth <= self._block["depth"]:
+            self._block = None
+
+    def handle_data(self, data):
+        if self._value_depth is not None:
+            self._block["html"] += escape(data, quote=False)
+            self._block["text"] += data
+        elif self._label_depth is not None:
+            self._block["label"] += data
+
+    def key_information(self):
+        candidates = [b for b in self.blocks if "KeyInformation" in b["classes"]]
+        candidates += [b for b in self.blocks if KEY_INFORMATION_LABEL in b["label"]]
+        for block in candidates:
+            if block["has_value"]:
+                return {"found": True, "content": block["html"], "textContent": block["text"].strip()}
+        if candidates:
+            return {"found": False, "error": "Div de contenido no encontrado dentro de la sección"}
+        return {"found": False, "error": "Sección de información clave no encontrada"}
+
+
+def parse_toc(html):
+    parser = TocParser()
+    parser.feed(html)
+    parser.close()
+    return parser.documents
+
+
+def parse_key_information(html):
+    parser = KeyInformationParser()
+    parser.feed(html)
+    parser.close()
+    return parser.key_information()
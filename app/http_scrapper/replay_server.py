@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import FastAPI, Request, Response
+
+# Servidor local que reproduce respuestas de ECHA grabadas con HTTP_RECORD_DIR.
+# Para probar el motor HTTP sin red:
+#   python -m app.http_scrapper.replay_server <directorio_grabaciones> [puerto]
+#   ECHA_BASE_URL=http://127.0.0.1:8900 python main.py
+
+
+def _clave(method, path, query):
+    return method.upper(), path, urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def cargar_grabaciones(directory):
+    recordings = {}
+    with open(os.path.join(directory, "index.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            with open(os.path.join(directory, entry["file"]), "rb") as body:
+                entry["body"] = body.read()
+            # La última grabación de una misma petición es la que vale
+            recordings[_clave(entry["method"], entry["path"], entry["query"])] = entry
+            recordings.setdefault((entry["method"].upper(), entry["path"], None), entry)
+    return recordings
+
+
+def create_app(directory):
+    recordings = cargar_grabaciones(directory)
+    app = FastAPI()
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def replay(request: Request, path: str):
+        entry = (recordings.get(_clave(request.method, request.url.path, request.url.query))
+                 or recordings.get((request.method.upper(), request.url.path, None)))
+        if entry is None:
+            return Response(status_code=404, content=f"Sin grabación para {request.url.path}")
+        return Response(content=entry["body"], status_code=entry["status"], media_type=entry["content_type"] or None)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    if len(sys.argv) < 2:
+        print("❌ Falta el directorio de grabaciones")
+        sys.exit(1)
+
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8900
+    uvicorn.run(create_app(sys.argv[1]), host="127.0.0.1", port=port)
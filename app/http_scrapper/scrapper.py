@@ -0,0 +1,326 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from urllib.parse import urljoin
+
+try:
+    import httpx
+except ImportError:  # El motor HTTP es opcional: sin httpx solo se usa Playwright
+    httpx = None
+
+from app import config
+from app.fingerprint import filas_api, huella
+from app.metrics import FUNCTION_DURATION, SCRAPES_IN_FLIGHT, registrar_resultado
+from app.http_scrapper.html_parsing import parse_key_information, parse_toc
+from app.toxicology import (TOXICOLOGY_NOAEL_SECTION_ID, TOXICOLOGY_SECTION_ID, elegir_resumen, endpoint,
+                            secciones_configuradas)
+from app.utils.upstream_limiter import default_limiter
+
+# Endpoints JSON/HTML que usa la SPA de chem.echa.europa.eu
+SEARCH_PATH = "/api-substance/v1/substance"
+DOSSIER_LIST_PATH = "/api-dossier-list/v1/dossier"
+DOSSIER_VIEW_PATH = "/html-pages-prod/{dossier_id}/index.html"
+
+# Tras detectar un cambio de endpoint dejamos de intentar el motor HTTP durante un rato
+ENDPOINT_CHANGED_COOLDOWN = 600
+
+
+class EndpointChanged(Exception):
+    # La respuesta de ECHA no tiene la forma esperada: hay que usar el navegador
+    pass
+
+
+class RecursoNoEncontrado(Exception):
+    # 404/410 de un recurso concreto (visor de un dossier retirado, un documento): afecta solo a
+    # este scrape, no indica que ECHA haya cambiado sus endpoints
+    pass
+
+
+def _buscar_clave(data, clave):
+    # Busca recursivamente el primer valor de una clave en un JSON
+    if isinstance(data, dict):
+        if clave in data:
+            return data[clave]
+        data = list(data.values())
+    if isinstance(data, list):
+        for item in data:
+            valor = _buscar_clave(item, clave)
+            if valor is not None:
+                return valor
+    return None
+
+
+def _es_lead(item):
+    # El rol del registrante aparece en algún campo "...role..." con texto "Lead ..."
+    if isinstance(item, dict):
+        for key, value in item.items():
+            if "role" in key.lower() and isinstance(value, str) and "lead" in value.lower():
+                return True
+            if isinstance(value, (dict, list)) and _es_lead(value):
+                return True
+    elif isinstance(item, list):
+        return any(_es_lead(v) for v in item)
+    return False
+
+
+class HttpScrapper:
+    # Motor sin navegador: recorre búsqueda, registros, dossier Lead y documento con un cliente
+    # HTTP con pool de conexiones y devuelve el mismo "result" que run() de Playwright.
+
+    def __init__(self, base_url=None, record_dir=None):
+        self.base_url = (base_url or config.ECHA_BASE_URL).rstrip("/")
+        self.record_dir = config.HTTP_RECORD_DIR if record_dir is None else record_dir
+        self._client = None
+        self._recorded = 0
+        self.disabled_until = 0
+        # Ritmo y señales compartidos con Playwright (mismo host, mismo límite)
+        self.limiter = default_limiter.for_url(self.base_url)
+
+    @classmethod
+    def create(cls, **kwargs):
+        if not config.HTTP_ENGINE_ENABLED:
+            return None
+        if httpx is None:
+            print("⚠️ httpx no está instalado: motor HTTP desactivado")
+            return None
+        return cls(**kwargs)
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.disabled_until
+
+    async def start(self):
+        hooks = {"response": [self._grabar]} if self.record_dir else {}
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=config.HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=config.HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=config.HTTP_MAX_CONNECTIONS),
+            headers={"Accept": "application/json, text/html;q=0.9"},
+            event_hooks=hooks,
+        )
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _grabar(self, response):
+        # Guarda la respuesta para poder servirla después desde el servidor de reproducción
+        await response.aread()
+        os.makedirs(self.record_dir, exist_ok=True)
+        self._recorded += 1
+        nombre = f"{int(time.time() * 1000)}_{self._recorded}.body"
+        with open(os.path.join(self.record_dir, nombre), "wb") as f:
+            f.write(response.content)
+        entry = {
+            "method": response.request.method,
+            "path": response.request.url.path,
+            "query": response.request.url.query.decode(),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", ""),
+            "file": nombre,
+        }
+        with open(os.path.join(self.record_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    async def _get(self, url, params=None, recurso=False):
+        # recurso=True: un 404/410 es de ese recurso y no del endpoint (búsqueda y listado sí lo son)
+        if self.limiter is None:
+            response = await self._client.get(url, params=params)
+        else:
+            await self.limiter.acquire()
+            inicio = time.monotonic()
+            try:
+                response = await self._client.get(url, params=params)
+            except httpx.TimeoutException:
+                self.limiter.observe(timeout=True)
+                raise
+            self.limiter.observe(latency=time.monotonic() - inicio, status=response.status_code,
+                                 retry_after=response.headers.get("retry-after"))
+        if response.status_code in (404, 410):
+            error = RecursoNoEncontrado if recurso else EndpointChanged
+            raise error(f"{response.request.url} devolvió {response.status_code}")
+        response.raise_for_status()
+        return response
+
+    async def _get_json(self, url, params=None):
+        response = await self._get(url, params=params)
+        try:
+            return response, response.json()
+        except ValueError:
+            raise EndpointChanged(f"{response.request.url} no devolvió JSON")
+
+    async def run(self, cas_code, on_event=None):
+        if self._client is None:
+            await self.start()
+
+        result = {
+            "status": "started",
+            "cas_code": cas_code,
+            "data": None,
+            "message": "Iniciando scraping...",
+            "engine": "http",
+            "scrape_id": uuid.uuid4().hex,
+            "urls": {},
+        }
+
+        SCRAPES_IN_FLIGHT.labels(engine="http").inc()
+        try:
+            with FUNCTION_DURATION.labels(function="http_run").time():
+                await self._navegar(cas_code, result, on_event or (lambda stage, **data: None))
+            registrar_resultado("http", result)
+            return result
+        except EndpointChanged as e:
+            self.disabled_until = time.monotonic() + ENDPOINT_CHANGED_COOLDOWN
+            print(f"⚠️ Endpoint de ECHA cambiado ({str(e)}), motor HTTP en pausa")
+            raise
+        except httpx.HTTPError as e:
+            # 429/5xx, timeouts o conexión: ECHA no está respondiendo bien. El limitador ya recibió
+            # la señal en _get; no tiene sentido repetir el scrape con Playwright contra el mismo host
+            if isinstance(e, httpx.HTTPStatusError):
+                detalle = f"{e.response.status_code} en {e.request.url}"
+            else:
+                detalle = f"{type(e).__name__}: {str(e)}"
+            result["status"] = "error"
+            result["message"] = f"Error de ECHA: {detalle}"
+            registrar_resultado("http", result)
+            return result
+        finally:
+            SCRAPES_IN_FLIGHT.labels(engine="http").dec()
+
+    async def _navegar(self, cas_code, result, emit):
+        # 1. Búsqueda de la sustancia
+        response, search = await self._get_json(SEARCH_PATH, params={
+            "pageIndex": 1, "pageSize": 10, "searchText": cas_code})
+        result["urls"]["search"] = str(response.request.url)
+        # Cualquier forma inesperada del JSON se traduce aquí en EndpointChanged (se usa Playwright);
+        # el resto de excepciones son fallos del propio motor y no se enmascaran
+        if not isinstance(search, dict) or not isinstance(search.get("items"), list):
+            raise EndpointChanged("La búsqueda no devolvió una lista 'items'")
+        if not search["items"]:
+            result["status"] = "no_results"
+            result["message"] = "No se encontraron resultados para la búsqueda."
+            return result
+
+        rml_id = _buscar_clave(search["items"][0], "rmlId")
+        if not rml_id or not isinstance(rml_id, (str, int)):
+            raise EndpointChanged("El primer resultado no tiene 'rmlId'")
+        result["urls"]["substance"] = f"{self.base_url}/{rml_id}"
+        emit("search_results", url=result["urls"]["search"], rml_id=rml_id)
+
+        # 2. Registros REACH y dossier Lead
+        response, dossiers = await self._get_json(DOSSIER_LIST_PATH, params={
+            "pageIndex": 1, "pageSize": 100, "rmlId": rml_id, "registrationStatuses": "Active"})
+        result["urls"]["registrations"] = str(response.request.url)
+        if not isinstance(dossiers, dict) or not isinstance(dossiers.get("items"), list):
+            raise EndpointChanged("El listado de dossiers no devolvió una lista 'items'")
+
+        result["fingerprint"] = huella(filas_api(dossiers["items"]))
+        lead = next((item for item in dossiers["items"] if _es_lead(item)), None)
+        if lead is None:
+            result["status"] = "error"
+            result["message"] = "No se encontró ningún dosier con rol 'Lead'."
+            return result
+
+        dossier_id = _buscar_clave(lead, "assetExternalId")
+        if not dossier_id or not isinstance(dossier_id, (str, int)):
+            raise EndpointChanged("El dossier Lead no tiene 'assetExternalId'")
+        emit("lead_dossier_found", dossier_id=dossier_id)
+
+        # 3. Árbol de contenidos del visor del dossier
+        dossier_url = DOSSIER_VIEW_PATH.format(dossier_id=dossier_id)
+        response = await self._get(dossier_url, recurso=True)
+        result["urls"]["dossier"] = str(response.url)
+        documents = parse_toc(response.text)
+        if not documents:
+            raise EndpointChanged("El visor del dossier no tiene árbol de contenidos")
+        emit("lead_dossier_opened", url=result["urls"]["dossier"])
+
+        extraction_data = {
+            "toxicology_accessed": any(TOXICOLOGY_SECTION_ID in d["sections"] for d in documents),
+            "summary_data": None,
+            "error": None,
+        }
+        result["data"] = extraction_data
+
+        document = elegir_resumen(documents, TOXICOLOGY_NOAEL_SECTION_ID)
+        if document is None:
+            extraction_data["error"] = "Error en NOAEL: no se encontró el resumen de toxicidad por dosis repetidas"
+        else:
+            document_url = urljoin(str(response.url), document["href"])
+            result["urls"]["document"] = document_url
+            try:
+                extraction_data["summary_data"] = await self._extraer_resumen(document_url)
+            except RecursoNoEncontrado as e:
+                extraction_data["summary_data"] = {"iframe_found": False, "content_extracted": False, "key_info": None,
+                                                   "error": f"Error general en extracción de resumen: {str(e)}"}
+            if extraction_data["summary_data"]["content_extracted"]:
+                emit("summary_extracted", url=document_url)
+
+        # Resto de secciones configuradas, en paralelo sobre el mismo árbol de contenidos
+        secciones = secciones_configuradas()
+        extraidos = await asyncio.gather(*(
+            self._extraer_endpoint(documents, section_id, str(response.url), result, emit)
+            for section_id in secciones))
+        extraction_data["endpoints"] = dict(zip(secciones, extraidos))
+
+        result["status"] = "success"
+        result["message"] = "Scraping completado exitosamente"
+        return result
+
+    async def huella(self, cas_code):
+        # Refresco incremental: solo búsqueda y listado de dossiers, sin visor ni documentos
+        if self._client is None:
+            await self.start()
+        _, search = await self._get_json(SEARCH_PATH, params={"pageIndex": 1, "pageSize": 10, "searchText": cas_code})
+        items = search.get("items") if isinstance(search, dict) else None
+        rml_id = _buscar_clave(items[0], "rmlId") if isinstance(items, list) and items else None
+        if not rml_id:
+            return None
+        _, dossiers = await self._get_json(DOSSIER_LIST_PATH, params={
+            "pageIndex": 1, "pageSize": 100, "rmlId": rml_id, "registrationStatuses": "Active"})
+        if not isinstance(dossiers, dict) or not isinstance(dossiers.get("items"), list):
+            return None
+        return huella(filas_api(dossiers["items"]))
+
+    async def _extraer_endpoint(self, documents, section_id, dossier_url, result, emit):
+        document = elegir_resumen(documents, section_id)
+        if document is None:
+            return endpoint(error="Sección no encontrada en el árbol de contenidos")
+
+        document_url = urljoin(dossier_url, document["href"])
+        if document_url == result["urls"].get("document") and result["data"]["summary_data"]:
+            # El resumen NOAEL ya se descargó
+            return endpoint(document, document_url, result["data"]["summary_data"])
+        try:
+            summary = await self._extraer_resumen(document_url)
+        except Exception as e:
+            return endpoint(document, document_url, error=f"Error descargando el documento: {str(e)}")
+        emit("endpoint_extracted", section_id=section_id, url=document_url)
+        return endpoint(document, document_url, summary)
+
+    async def _extraer_resumen(self, document_url):
+        summary_data = {
+            "iframe_found": True,
+            "content_extracted": False,
+            "key_info": None,
+            "error": None
+        }
+
+        response = await self._get(document_url, recurso=True)
+        key_info = parse_key_information(response.text)
+
+        if key_info.get("found"):
+            summary_data["content_extracted"] = True
+            summary_data["key_info"] = {
+                "html_content": key_info.get("content"),
+                "text_content": key_info.get("textContent")
+            }
+        else:
+            summary_data["error"] = key_info.get("error", "Error desconocido al extraer información")
+
+        return summary_data
@@ -0,0 +1,109 @@
+from app.utils.metrics import Counter, Gauge, Histogram
+
+# Métricas del scraper expuestas en GET /metrics
+
+FUNCTION_DURATION = Histogram(
+    "scrapper_function_duration_seconds",
+    "Duración de run(), extraer_info_dossier(), extraer_documentos() y del motor HTTP",
+    ["function"])
+STEP_DURATION = Histogram(
+    "scrapper_step_duration_seconds",
+    "Duración de cada paso de la navegación (landing, search, substance, registrations, dossier, document)",
+    ["step"])
+WAIT_DURATION = Histogram(
+    "scrapper_readiness_wait_seconds",
+    "Tiempo de espera hasta cada condición de disponibilidad",
+    ["condition"])
+SCRAPE_OUTCOMES = Counter(
+    "scrapper_outcomes_total",
+    "Scrapes terminados por motor, estado y clase de error",
+    ["engine", "status", "error"])
+SCRAPES_IN_FLIGHT = Gauge(
+    "scrapper_scrapes_in_flight",
+    "Scrapes en curso por motor",
+    ["engine"])
+SCRAPE_RETRIES = Counter(
+    "scrapper_retries_total",
+    "Reintentos de run() por clase de error y paso desde el que se reanuda",
+    ["error", "resume_from"])
+
+BROWSER_LAUNCH_DURATION = Histogram(
+    "scrapper_browser_launch_seconds",
+    "Tiempo de arranque de un navegador Chromium",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16))
+BROWSER_CLOSE_DURATION = Histogram(
+    "scrapper_browser_close_seconds",
+    "Tiempo de cierre de un navegador Chromium",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4))
+BROWSERS_RUNNING = Gauge("scrapper_browsers_running", "Navegadores abiertos")
+BROWSER_CONTEXTS_IN_USE = Gauge("scrapper_browser_contexts_in_use", "Contextos de navegador abiertos")
+BROWSER_RSS = Gauge("scrapper_browser_rss_bytes", "RSS del árbol de procesos de cada navegador del pool", ["browser"])
+BROWSER_RECYCLES = Counter(
+    "scrapper_browser_recycles_total", "Navegadores reciclados por motivo (scrapes, memory, age)", ["reason"])
+SCRAPE_BROWSER_RSS = Histogram(
+    "scrapper_scrape_browser_rss_bytes",
+    "RSS del navegador al terminar cada scrape",
+    buckets=tuple(mb * 1024 * 1024 for mb in (100, 200, 400, 600, 800, 1000, 1500, 2000, 3000)))
+
+RESULT_CACHE_LOOKUPS = Counter(
+    "scrapper_result_cache_lookups_total", "Consultas a la caché de resultados", ["result"])
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "scrapper_single_flight_requests_total", "Peticiones ejecutadas o coalescidas por single-flight", ["outcome"])
+ASSET_CACHE_REQUESTS = Counter(
+    "scrapper_asset_cache_requests_total", "Recursos estáticos servidos por la caché en disco (hit, revalidated, miss)",
+    ["outcome"])
+INCREMENTAL_CHECKS = Counter(
+    "scrapper_incremental_checks_total",
+    "Comprobaciones de huella del refresco incremental (unchanged, changed, unverifiable)",
+    ["outcome"])
+HTTP_ENGINE_FALLBACKS = Counter(
+    "scrapper_http_engine_fallbacks_total", "Scrapes del motor HTTP que acabaron en Playwright")
+JOBS_QUEUE_DEPTH = Gauge("scrapper_jobs_queue_depth", "Trabajos pendientes en la cola")
+JOBS_RUNNING = Gauge("scrapper_jobs_running", "Trabajos en ejecución")
+
+UPSTREAM_CONCURRENCY_LIMIT = Gauge(
+    "scrapper_upstream_concurrency_limit", "Límite adaptativo de scrapes simultáneos por host", ["host"])
+UPSTREAM_IN_FLIGHT = Gauge("scrapper_upstream_in_flight", "Scrapes en curso contra cada host", ["host"])
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "scrapper_upstream_queue_depth", "Scrapes esperando hueco en el límite de cada host", ["host"])
+UPSTREAM_SIGNALS = Counter(
+    "scrapper_upstream_signals_total", "Respuestas de ECHA que ajustan el límite (ok, slow, throttled, error, timeout)",
+    ["host", "signal"])
+
+# Clase de error a partir de los mensajes de run() y de la extracción del dossier
+ERROR_CLASSES = [
+    ("No se encontró el checkbox", "legal_notice_missing"),
+    ("No se encontró el input de búsqueda", "search_form_missing"),
+    ("No se encontró el enlace en la primera fila", "first_result_missing"),
+    ("No se encontró el enlace de REACH", "reach_link_missing"),
+    ("El enlace de REACH registrations no apareció", "reach_link_timeout"),
+    ("No se encontró el enlace al dossier", "lead_link_missing"),
+    ("No se encontró ningún dosier con rol 'Lead'", "no_lead_dossier"),
+    ("La tabla de dosieres no apareció", "dossier_table_timeout"),
+    ("No se pudo encontrar el iframe dentro del Shadow DOM", "dossier_iframe_missing"),
+    ("Error en NOAEL", "noael_error"),
+    ("Error en toxicología", "toxicology_error"),
+    ("Sección de información clave no encontrada", "key_info_missing"),
+    ("Error de ECHA", "upstream_error"),
+    ("Error inesperado", "unexpected"),
+    ("Error general", "unexpected"),
+]
+
+
+def clase_error(result):
+    data = result.get("data") or {}
+    summary = data.get("summary_data") or {}
+    mensajes = [result.get("message") if result.get("status") == "error" else None,
+                data.get("error"), summary.get("error")]
+    for mensaje in mensajes:
+        if not mensaje:
+            continue
+        for prefijo, clase in ERROR_CLASSES:
+            if prefijo in mensaje:
+                return clase
+        return "other"
+    return "none"
+
+
+def registrar_resultado(engine, result):
+    SCRAPE_OUTCOMES.labels(engine=engine, status=result.get("status"), error=clase_error(result)).inc()
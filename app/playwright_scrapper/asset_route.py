@@ -0,0 +1,89 @@
+import time
+
+from app import config
+from app.metrics import ASSET_CACHE_REQUESTS
+from app.utils.upstream_limiter import host_de
+
+
+class AssetCacheRoute:
+    # Sirve los recursos estáticos de ECHA desde AssetCache en lugar de descargarlos con cada
+    # navegador nuevo. Aciertos frescos: route.fulfill desde disco. Caducados: route.fetch
+    # condicional (If-None-Match / If-Modified-Since) y, con 304, el cuerpo guardado.
+    #
+    # Orden de rutas (Playwright ejecuta primero la última registrada): RequestFilter -> esta
+    # -> UpstreamThrottle. Lo bloqueado nunca llega aquí y lo que no es estático sigue con
+    # route.fallback(). route.fetch no vuelve a pasar por las rutas del contexto.
+
+    def __init__(self, cache, base_url=None, resource_types=None):
+        self.cache = cache
+        self.host = host_de(base_url or config.ECHA_BASE_URL)
+        self.resource_types = set(resource_types or config.ASSET_CACHE_RESOURCE_TYPES)
+        self.outcomes = {"hit": 0, "revalidated": 0, "miss": 0}
+        self.bytes_from_cache = 0
+
+    async def attach(self, context):
+        if self.cache is None:
+            return
+        await context.route(lambda url: host_de(url) == self.host, self._handle)
+
+    def _contar(self, outcome, size):
+        self.outcomes[outcome] += 1
+        if outcome != "miss":
+            self.bytes_from_cache += size
+        self.cache.record(outcome, size)
+        ASSET_CACHE_REQUESTS.labels(outcome=outcome).inc()
+
+    async def _servir(self, route, entry, body, outcome):
+        headers = {**self.cache.headers(entry), "x-asset-cache": outcome}
+        await route.fulfill(status=entry["status"], headers=headers, body=body)
+        self._contar(outcome, len(body))
+
+    async def _handle(self, route):
+        request = route.request
+        if request.method != "GET" or request.resource_type not in self.resource_types:
+            await route.fallback()
+            return
+
+        entry = await self.cache.get(request.url)
+        body = await self.cache.read(entry) if entry is not None else None
+        if body is None:
+            entry = None
+        elif entry["fresh_until"] > time.time():
+            await self.cache.touch(entry)
+            await self._servir(route, entry, body, "hit")
+            return
+
+        headers = dict(request.headers)
+        if entry is not None:
+            if entry["etag"]:
+                headers["if-none-match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["if-modified-since"] = entry["last_modified"]
+
+        try:
+            response = await route.fetch(headers=headers)
+        except Exception as e:
+            print(f"⚠️ No se pudo descargar {request.url} para la caché de recursos: {str(e)}")
+            await route.fallback()
+            return
+
+        if response.status == 304 and entry is not None:
+            await self.cache.touch(entry, response.headers)
+            await self._servir(route, entry, body, "revalidated")
+            return
+
+        body = await response.body()
+        if response.status == 200:
+            try:
+                await self.cache.put(request.url, response.status, response.headers, body)
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar {request.url} en la caché de recursos: {str(e)}")
+        await route.fulfill(response=response, body=body)
+        self._contar("miss", len(body))
+
+    def report(self):
+        return {
+            "enabled": self.cache is not None,
+            **self.outcomes,
+            "bytes_from_cache": self.bytes_from_cache,
+        }
@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from app import config
+from app.metrics import (BROWSER_CLOSE_DURATION, BROWSER_CONTEXTS_IN_USE, BROWSER_LAUNCH_DURATION, BROWSER_RECYCLES,
+                         BROWSER_RSS, BROWSERS_RUNNING, SCRAPE_BROWSER_RSS)
+from app.utils.process_memory import rss_tree
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-dev-shm-usage']
+
+# Memoria JS de la página principal al terminar el scrape (solo Chromium expone performance.memory)
+JS_HEAP_JS = "() => performance.memory ? performance.memory.usedJSHeapSize : null"
+
+
+class _BrowserSlot:
+    # Un navegador del pool, cuántos contextos tiene abiertos y lo que lleva consumido
+    _ids = itertools.count()
+
+    def __init__(self, browser, pid=None):
+        self.id = next(self._ids)
+        self.browser = browser
+        self.pid = pid
+        self.in_use = 0
+        self.scrapes = 0
+        self.launched_at = time.monotonic()
+        self.rss = None
+        # Reciclándose: no recibe contextos nuevos y se cierra cuando in_use llega a 0
+        self.draining = False
+        self.idle = asyncio.Event()
+
+
+async def _browser_pid(browser):
+    # Playwright no expone el pid de Chromium; el proceso "browser" lo da CDP
+    try:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send("SystemInfo.getProcessInfo")
+        finally:
+            await session.detach()
+        return next((p["id"] for p in info.get("processInfo", []) if p.get("type") == "browser"), None)
+    except Exception as e:
+        print(f"⚠️ No se pudo obtener el pid del navegador: {str(e)}")
+        return None
+
+
+class BrowserPool:
+    # Mantiene N navegadores Chromium calientes y entrega un BrowserContext nuevo por scrape.
+    # El número de contextos simultáneos está limitado a size * max_contexts_per_browser,
+    # así una ráfaga de peticiones espera turno en lugar de lanzar navegadores sin control.
+    #
+    # Un vigilante muestrea el RSS del árbol de procesos de cada navegador y lo recicla tras
+    # N scrapes, por memoria o por edad: se lanza el sustituto, el viejo deja de recibir
+    # contextos y se cierra cuando terminan los scrapes que tenía en curso.
+
+    def __init__(self, size=None, max_contexts_per_browser=None, headless=None, recycle_after_scrapes=None,
+                 recycle_max_rss_mb=None, recycle_max_age=None, max_pages_per_context=None):
+        self.size = size or config.BROWSER_POOL_SIZE
+        self.max_contexts_per_browser = max_contexts_per_browser or config.MAX_CONTEXTS_PER_BROWSER
+        self.headless = config.BROWSER_HEADLESS if headless is None else headless
+        self.recycle_after_scrapes = (config.BROWSER_RECYCLE_AFTER_SCRAPES if recycle_after_scrapes is None
+                                      else recycle_after_scrapes)
+        self.recycle_max_rss = (config.BROWSER_RECYCLE_MAX_RSS_MB if recycle_max_rss_mb is None
+                                else recycle_max_rss_mb) * 1024 * 1024
+        self.recycle_max_age = config.BROWSER_RECYCLE_MAX_AGE if recycle_max_age is None else recycle_max_age
+        self.max_pages_per_context = (config.BROWSER_MAX_PAGES_PER_CONTEXT if max_pages_per_context is None
+                                      else max_pages_per_context)
+        self._playwright = None
+        self._slots = []
+        self._capacity = None
+        self._lock = asyncio.Lock()
+        self._context_slots = {}
+        self._watchdog = None
+        self._recycling = set()
+        self.recycles = {"scrapes": 0, "memory": 0, "age": 0}
+
+    @property
+    def started(self):
+        return self._playwright is not None
+
+    async def start(self):
+        if self.started:
+            return
+        self._playwright = await async_playwright().start()
+        self._capacity = asyncio.Semaphore(self.size * self.max_contexts_per_browser)
+        for _ in range(self.size):
+            self._slots.append(await self._nuevo_slot())
+        self._watchdog = asyncio.create_task(self._vigilar())
+        print(f"Pool de navegadores iniciado: {self.size} navegadores, "
+              f"{self.max_contexts_per_browser} contextos por navegador")
+
+    async def _cerrar(self, slot):
+        try:
+            with BROWSER_CLOSE_DURATION.time():
+                await slot.browser.close()
+        except Exception as e:
+            print(f"Error cerrando browser del pool: {str(e)}")
+        BROWSERS_RUNNING.dec()
+        BROWSER_RSS.remove(browser=slot.id)
+
+    async def stop(self):
+        if self._watchdog:
+            self._watchdog.cancel()
+            await asyncio.gather(self._watchdog, return_exceptions=True)
+            self._watchdog = None
+        for task in list(self._recycling):
+            task.cancel()
+        await asyncio.gather(*self._recycling, return_exceptions=True)
+        for slot in self._slots:
+            await self._cerrar(slot)
+        self._slots = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        print("Pool de navegadores detenido")
+
+    async def _launch(self):
+        with BROWSER_LAUNCH_DURATION.time():
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        BROWSERS_RUNNING.inc()
+        return browser
+
+    async def _nuevo_slot(self):
+        browser = await self._launch()
+        return _BrowserSlot(browser, await _browser_pid(browser))
+
+    async def _checkout(self):
+        async with self._lock:
+            # Elegimos el navegador con menos contextos abiertos entre los que no se están reciclando
+            # (si todos lo están, mientras arranca el sustituto, cualquiera vale)
+            candidatos = [s for s in self._slots if not s.draining] or self._slots
+            slot = min(candidatos, key=lambda s: s.in_use)
+            if not slot.browser.is_connected():
+                print("⚠️ Navegador desconectado, relanzando...")
+                BROWSERS_RUNNING.dec()
+                slot.browser = await self._launch()
+                slot.pid = await _browser_pid(slot.browser)
+                slot.scrapes = 0
+                slot.launched_at = time.monotonic()
+            slot.in_use += 1
+            BROWSER_CONTEXTS_IN_USE.inc()
+            return slot
+
+    def _limitar_paginas(self, context, page):
+        # Popups y ventanas que abra ECHA no pueden acumular páginas dentro del contexto
+        if len(context.pages) > self.max_pages_per_context:
+            print(f"⚠️ Contexto con más de {self.max_pages_per_context} páginas, cerrando {page.url}")
+            asyncio.ensure_future(page.close())
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        if not self.started:
+            raise RuntimeError("El pool de navegadores no está iniciado")
+
+        async with self._capacity:
+            slot = await self._checkout()
+            context = None
+            try:
+                # Sin service workers todas las peticiones pasan por context.route()
+                context_options.setdefault("service_workers", "block")
+                context = await slot.browser.new_context(**context_options)
+                if self.max_pages_per_context:
+                    context.on("page", lambda page: self._limitar_paginas(context, page))
+                self._context_slots[id(context)] = slot
+                yield context
+            finally:
+                if context:
+                    self._context_slots.pop(id(context), None)
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        print(f"Error cerrando contexto: {str(e)}")
+                slot.in_use -= 1
+                slot.scrapes += 1
+                BROWSER_CONTEXTS_IN_USE.dec()
+                if slot.draining:
+                    if slot.in_use == 0:
+                        slot.idle.set()
+                else:
+                    motivo = self._motivo_reciclaje(slot)
+                    if motivo:
+                        self._reciclar(slot, motivo)
+
+    def _motivo_reciclaje(self, slot):
+        if self.recycle_after_scrapes and slot.scrapes >= self.recycle_after_scrapes:
+            return "scrapes"
+        # Un navegador recién lanzado no baja de memoria por reciclarlo: evitamos el bucle
+        if self.recycle_max_rss and slot.scrapes and slot.rss is not None and slot.rss >= self.recycle_max_rss:
+            return "memory"
+        if self.recycle_max_age and time.monotonic() - slot.launched_at >= self.recycle_max_age:
+            return "age"
+        return None
+
+    def _reciclar(self, slot, motivo):
+        if slot.draining:
+            return
+        slot.draining = True
+        task = asyncio.create_task(self._reemplazar(slot, motivo))
+        self._recycling.add(task)
+        task.add_done_callback(self._recycling.discard)
+
+    async def _reemplazar(self, slot, motivo):
+        rss_mb = round(slot.rss / 1e6, 1) if slot.rss is not None else None
+        print(f"♻️ Reciclando navegador {slot.id} ({motivo}: {slot.scrapes} scrapes, {rss_mb} MB)")
+        self.recycles[motivo] += 1
+        BROWSER_RECYCLES.labels(reason=motivo).inc()
+        try:
+            nuevo = await self._nuevo_slot()
+        except Exception as e:
+            # Sin sustituto seguimos con el viejo: mejor memoria alta que perder capacidad
+            print(f"⚠️ No se pudo lanzar el navegador de reemplazo: {str(e)}")
+            slot.draining = False
+            return
+        self._slots.append(nuevo)
+        # Drenaje: los scrapes en curso terminan en el navegador viejo
+        while slot.in_use:
+            slot.idle.clear()
+            await slot.idle.wait()
+        self._slots.remove(slot)
+        await self._cerrar(slot)
+
+    async def _muestrear(self):
+        for slot in list(self._slots):
+            if slot.pid is None:
+                continue
+            slot.rss = await asyncio.to_thread(rss_tree, slot.pid)
+            BROWSER_RSS.labels(browser=slot.id).set(slot.rss)
+
+    async def _vigilar(self):
+        while True:
+            await asyncio.sleep(config.BROWSER_WATCHDOG_INTERVAL)
+            try:
+                await self._muestrear()
+                for slot in list(self._slots):
+                    if not slot.draining:
+                        motivo = self._motivo_reciclaje(slot)
+                        if motivo:
+                            self._reciclar(slot, motivo)
+            except Exception as e:
+                print(f"⚠️ Error en la vigilancia de memoria de los navegadores: {str(e)}")
+
+    async def memoria(self, context, page=None):
+        # Memoria al final de un scrape: RSS del navegador que lo ejecutó y heap JS de la página
+        slot = self._context_slots.get(id(context))
+        if slot is None:
+            return None
+        rss = await asyncio.to_thread(rss_tree, slot.pid) if slot.pid is not None else None
+        if rss is not None:
+            slot.rss = rss
+            SCRAPE_BROWSER_RSS.observe(rss)
+        js_heap = None
+        if page is not None and not page.is_closed():
+            try:
+                js_heap = await page.evaluate(JS_HEAP_JS)
+            except Exception:
+                pass
+        return {
+            "browser": slot.id,
+            "browser_rss_mb": round(rss / 1e6, 1) if rss is not None else None,
+            "js_heap_mb": round(js_heap / 1e6, 1) if js_heap else None,
+            "browser_scrapes": slot.scrapes + 1,
+        }
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "browsers": len(self._slots),
+            "max_contexts_per_browser": self.max_contexts_per_browser,
+            "contexts_in_use": sum(slot.in_use for slot in self._slots),
+            "recycles": dict(self.recycles),
+            "browser_details": [{
+                "id": slot.id,
+                "pid": slot.pid,
+                "in_use": slot.in_use,
+                "scrapes": slot.scrapes,
+                "age_s": round(now - slot.launched_at),
+                "rss_mb": round(slot.rss / 1e6, 1) if slot.rss is not None else None,
+                "draining": slot.draining,
+            } for slot in self._slots],
+        }
@@ -0,0 +1,53 @@
+# Extracción en un solo viaje al navegador: cada paso obtiene con un único evaluate todo lo que
+# necesita como JSON. Los ElementHandle/locators se reservan para los clicks.
+
+# Primer resultado de la búsqueda: [selector de filas, selector del enlace]
+SEARCH_RESULTS_JS = """([rowsSelector, linkSelector]) => {
+    const link = document.querySelector(linkSelector);
+    return {
+        count: document.querySelectorAll(rowsSelector).length,
+        href: link ? link.getAttribute('href') : null,
+        name: link ? link.textContent.trim() : null,
+    };
+}"""
+
+# Enlace que contiene el primer elemento que casa con el selector (p. ej. el label de REACH registrations)
+CLOSEST_LINK_JS = """(selector) => {
+    const element = document.querySelector(selector);
+    const link = element ? element.closest('a') : null;
+    return link ? {href: link.getAttribute('href'), text: link.textContent.replace(/\\s+/g, ' ').trim()} : null;
+}"""
+
+# Filas de la tabla de dosieres: rol, titular, enlace y el resto de celdas con data-cy
+REGISTRATION_ROWS_JS = """([roleSelector, linkSelector]) => Array.from(document.querySelectorAll(roleSelector)).map((span, index) => {
+    const row = span.closest('tr');
+    const cells = {};
+    for (const td of row ? row.querySelectorAll('td[data-cy]') : []) {
+        cells[td.getAttribute('data-cy')] = td.textContent.replace(/\\s+/g, ' ').trim();
+    }
+    const ownerKey = Object.keys(cells).find(k => k.includes('owner') && !k.includes('role'));
+    const link = row ? row.querySelector(linkSelector) : null;
+    return {
+        index: index,
+        role: span.textContent.replace(/\\s+/g, ' ').trim(),
+        owner: ownerKey ? cells[ownerKey] : null,
+        href: link ? link.getAttribute('href') : null,
+        cells: cells,
+    };
+})"""
+
+
+async def resultados_busqueda(page, rows_selector, link_selector):
+    return await page.evaluate(SEARCH_RESULTS_JS, [rows_selector, link_selector])
+
+
+async def enlace_contenedor(page, selector):
+    return await page.evaluate(CLOSEST_LINK_JS, selector)
+
+
+async def filas_registro(page, role_selector, link_selector):
+    return await page.evaluate(REGISTRATION_ROWS_JS, [role_selector, link_selector])
+
+
+def fila_lead(rows):
+    return next((row for row in rows if "lead" in row["role"].lower()), None)
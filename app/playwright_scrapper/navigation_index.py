@@ -0,0 +1,46 @@
+import time
+
+from app import config
+from app.utils.sqlite_store import SqliteStore
+
+# Niveles de la navegación, del más profundo al más superficial
+LEVELS = ("dossier", "registrations", "substance")
+
+
+class NavigationIndex(SqliteStore):
+    # Recuerda por CAS las URLs de la sustancia, de sus registros REACH y del dossier Lead,
+    # para que el siguiente scrape salte directamente al enlace válido más profundo.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS nav_index (
+            cas_code TEXT NOT NULL,
+            level TEXT NOT NULL,
+            url TEXT NOT NULL,
+            validated_at REAL NOT NULL,
+            PRIMARY KEY (cas_code, level)
+        );
+    """
+
+    def __init__(self, path=None, ttl=None):
+        super().__init__(path or config.NAV_INDEX_PATH)
+        self.ttl = config.NAV_INDEX_TTL if ttl is None else ttl
+
+    async def get(self, cas_code):
+        rows = await self.execute(
+            "SELECT level, url FROM nav_index WHERE cas_code = ? AND validated_at > ?",
+            (cas_code, time.time() - self.ttl), fetch="all")
+        return {row["level"]: row["url"] for row in rows}
+
+    async def record(self, cas_code, urls):
+        now = time.time()
+        for level in LEVELS:
+            if urls.get(level):
+                await self.execute(
+                    "INSERT OR REPLACE INTO nav_index (cas_code, level, url, validated_at) VALUES (?, ?, ?, ?)",
+                    (cas_code, level, urls[level], now))
+
+    async def invalidate(self, cas_code, level=None):
+        if level is None:
+            await self.execute("DELETE FROM nav_index WHERE cas_code = ?", (cas_code,))
+        else:
+            await self.execute("DELETE FROM nav_index WHERE cas_code = ? AND level = ?", (cas_code, level))
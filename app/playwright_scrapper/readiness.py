@@ -0,0 +1,64 @@
+# Condiciones de disponibilidad de cada paso de la navegación. En lugar de dormir un tiempo fijo
+# o esperar a "networkidle", cada paso espera exactamente el elemento o iframe que necesita.
+
+DOSSIER_VIEW_HOST = "iucdas-mod-dossier-view-app"
+DOSSIER_IFRAME_SELECTOR = 'iframe[title="Dossier view"]'
+DOCUMENT_SECTION_SELECTOR = "section.das-block"
+
+# Devuelve el src del iframe cuando existe (opcionalmente dentro de un shadow root)
+_IFRAME_SRC_JS = """([hostSelector, iframeSelector]) => {
+    let root = document;
+    if (hostSelector) {
+        const host = document.querySelector(hostSelector);
+        root = host ? host.shadowRoot : null;
+    }
+    if (!root) {
+        return null;
+    }
+    const iframe = root.querySelector(iframeSelector);
+    return iframe && iframe.src ? iframe.src : null;
+}"""
+
+
+async def elemento(session, condition, frame, selector, state="visible", timeout=None):
+    return await session.wait_until(condition, frame.wait_for_selector(selector, state=state, timeout=timeout))
+
+
+async def alguno(session, condition, page, selectors, state="attached", timeout=None):
+    # Espera al primero de varios selectores (admite selectores encadenados con ">>")
+    locator = page.locator(selectors[0])
+    for selector in selectors[1:]:
+        locator = locator.or_(page.locator(selector))
+    await session.wait_until(condition, locator.first.wait_for(state=state, timeout=timeout))
+
+
+async def iframe_con_src(session, condition, frame, iframe_selector, host_selector=None, timeout=None):
+    # Espera a que el iframe esté adjunto con un src
+    handle = await session.wait_until(
+        condition,
+        frame.wait_for_function(_IFRAME_SRC_JS, arg=[host_selector, iframe_selector], timeout=timeout))
+    return await handle.json_value()
+
+
+async def frame_cargado(session, condition, page, src, timeout=None):
+    # Localiza el frame hijo cuyo documento es src y espera a que su DOM esté listo
+    async def _esperar():
+        frame = _buscar_frame(page, src)
+        while frame is None:
+            await page.wait_for_event("framenavigated", timeout=timeout)
+            frame = _buscar_frame(page, src)
+        await frame.wait_for_load_state("domcontentloaded", timeout=timeout)
+        return frame
+
+    return await session.wait_until(condition, _esperar())
+
+
+def _buscar_frame(page, src):
+    # Una sola pasada: coincidencia exacta o, si no la hay, la primera URL que contiene src
+    parcial = None
+    for frame in page.frames:
+        if frame.url == src:
+            return frame
+        if parcial is None and src in frame.url:
+            parcial = frame
+    return parcial
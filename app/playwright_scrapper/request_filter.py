@@ -0,0 +1,102 @@
+import re
+from collections import Counter
+
+from app import config
+
+# Analítica y trackers: no aportan nada a la extracción
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"hotjar\.com",
+    r"matomo",
+    r"piwik",
+    r"webanalytics\.europa\.eu",
+    r"europa\.eu/.*/(wt|webtools)\.load",
+]
+
+# Peticiones que nunca se bloquean en cada paso, aunque coincidan con las reglas anteriores.
+# "resource_types" y "url_patterns" se evalúan por separado.
+STEP_ALLOWLIST = {
+    "landing": {"resource_types": set(), "url_patterns": []},
+    "search": {"resource_types": set(), "url_patterns": []},
+    "substance": {"resource_types": set(), "url_patterns": []},
+    "registrations": {"resource_types": set(), "url_patterns": []},
+    # El visor de dossiers IUCLID pinta el árbol del TOC con fuentes de iconos
+    "dossier": {"resource_types": {"font"}, "url_patterns": []},
+    "document": {"resource_types": {"font"}, "url_patterns": []},
+}
+
+# Tamaño medio estimado (bytes) de lo que bloqueamos, para informar del ahorro
+ESTIMATED_BYTES = {
+    "image": 25_000,
+    "font": 60_000,
+    "media": 500_000,
+    "script": 40_000,
+    "other": 5_000,
+}
+
+
+class RequestFilter:
+    # Intercepta las peticiones del contexto y aborta las que la extracción no necesita.
+    # Se engancha a nivel de BrowserContext, así cubre también los iframes del visor IUCLID.
+
+    def __init__(self, resource_types=None, url_patterns=None, enabled=None):
+        self.enabled = config.REQUEST_FILTER_ENABLED if enabled is None else enabled
+        self.resource_types = set(resource_types or config.REQUEST_FILTER_RESOURCE_TYPES)
+        self.url_patterns = [
+            re.compile(p) for p in (url_patterns or DEFAULT_BLOCKED_URL_PATTERNS + config.REQUEST_FILTER_URL_PATTERNS)
+        ]
+        self.step = "landing"
+        self.blocked = Counter()
+        self.allowed_requests = 0
+        self.bytes_loaded = 0
+
+    def set_step(self, step):
+        self.step = step
+
+    async def attach(self, context):
+        if not self.enabled:
+            return
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def _allowlisted(self, request):
+        allow = STEP_ALLOWLIST.get(self.step)
+        if not allow:
+            return False
+        if request.resource_type in allow["resource_types"]:
+            return True
+        return any(re.search(p, request.url) for p in allow["url_patterns"])
+
+    def should_block(self, request):
+        if self._allowlisted(request):
+            return False
+        if request.resource_type in self.resource_types:
+            return True
+        return any(p.search(request.url) for p in self.url_patterns)
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request):
+            self.blocked[request.resource_type] += 1
+            await route.abort("blockedbyclient")
+        else:
+            self.allowed_requests += 1
+            await route.fallback()
+
+    def _on_response(self, response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.bytes_loaded += int(length)
+
+    def report(self):
+        bytes_saved = sum(ESTIMATED_BYTES.get(t, ESTIMATED_BYTES["other"]) * n for t, n in self.blocked.items())
+        return {
+            "enabled": self.enabled,
+            "requests_blocked": sum(self.blocked.values()),
+            "requests_blocked_by_type": dict(self.blocked),
+            "requests_allowed": self.allowed_requests,
+            "bytes_loaded": self.bytes_loaded,
+            "estimated_bytes_saved": bytes_saved,
+        }
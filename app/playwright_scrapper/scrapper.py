@@ -1,5 +1,26 @@
+import asyncio
+import random
+import uuid
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 
+from app import config
+from app.fingerprint import filas_pagina, huella
+from app.metrics import (BROWSER_CLOSE_DURATION, BROWSER_LAUNCH_DURATION, FUNCTION_DURATION, SCRAPE_RETRIES,
+                         SCRAPES_IN_FLIGHT, clase_error, registrar_resultado)
+from app.playwright_scrapper import extraction, readiness
+from app.playwright_scrapper.asset_route import AssetCacheRoute
+from app.playwright_scrapper.browser_pool import LAUNCH_ARGS
+from app.playwright_scrapper.request_filter import RequestFilter
+from app.playwright_scrapper.session import CHECKPOINT_RESULT_KEYS, ScrapeSession
+from app.playwright_scrapper.storage_state import default_store as default_storage_state
+from app.playwright_scrapper.upstream_throttle import UpstreamThrottle
+from app.toxicology import (TOXICOLOGY_NOAEL_SECTION_ID, TOXICOLOGY_SECTION_ID, elegir_resumen, endpoint,
+                            secciones_configuradas)
+from app.utils.metrics import timed
+
 CHECKBOX_ID = "legal-notice"
 LABEL_SELECTOR = f"label[for='{CHECKBOX_ID}']"
 INPUT_SELECTOR = f"input#{CHECKBOX_ID}"
@@ -13,409 +34,782 @@ RESULT_ROWS_SELECTOR = "tr.das-lib-tr_items"
 # Selector link dentro de la primera fila
 FIRST_RESULT_LINK_SELECTOR = f"{RESULT_ROWS_SELECTOR} a.das-strong.das-internal"
 
+REACH_LINK_LABEL_SELECTOR = "a.das-widget label[data-cy='dossierRegistrationCount-label']"
 REACH_LINK_SELECTOR = "a.das-widget >> label[data-cy='dossierRegistrationCount-label']"
 
 DOSSIER_ROLE_SELECTOR = 'td[data-cy="dossier-owner-js-role"] span'
+DOSSIER_LINK_SELECTOR = "td[data-cy='dossier-icon'] a"
+
+# Aviso legal visible y sin aceptar (el storage_state guardado ya no vale)
+NOTICE_PENDING_SELECTOR = f"{INPUT_SELECTOR}:not(:checked)"
+
+# Qué debe aparecer al abrir directamente cada URL del índice de navegación
+DEEP_LINK_READY_SELECTORS = [
+    ("dossier", readiness.DOSSIER_VIEW_HOST),
+    ("registrations", DOSSIER_ROLE_SELECTOR),
+    ("substance", REACH_LINK_SELECTOR),
+]
+
+# Errores transitorios (timeouts, iframes que no llegan a cargar): se reintenta desde el último
+# paso completado. El resto (sin resultados, sin dossier Lead, sin resumen NOAEL) es definitivo.
+RETRYABLE_ERRORS = {
+    "reach_link_timeout",
+    "dossier_table_timeout",
+    "dossier_iframe_missing",
+    "toxicology_error",
+    "unexpected",
+}
+
+# Dossier information: el TOC del visor se lee entero en un solo evaluate
+TOXICOLOGY_SECTION = f"button[data-toc-target='#{TOXICOLOGY_SECTION_ID}']"
+TOC_SECTION_BUTTON = "button[data-toc-target='#{section_id}']"
+TOC_SECTION_LEAVES = "li:has(> button[data-toc-target='#{section_id}']) a.das-leaf"
+# Cualquier sección u hoja del TOC: el árbol está pintado (tenga o no la sección 7)
+TOC_RENDERED = "button[data-toc-target], a.das-leaf"
+# Cada hoja (a.das-leaf) con su docid, título, URL absoluta y la ruta de secciones que la contienen
+TOC_INDEX_JS = """() => Array.from(document.querySelectorAll('a.das-leaf')).map(a => {
+    const docClass = Array.from(a.classList).find(c => c.startsWith('das-docid-'));
+    const sections = [];
+    for (let el = a.parentElement; el; el = el.parentElement) {
+        const button = el.querySelector(':scope > button[data-toc-target]');
+        if (button) {
+            sections.unshift(button.getAttribute('data-toc-target').replace(/^#/, ''));
+        }
+    }
+    return {
+        docid: docClass ? docClass.slice('das-docid-'.length) : null,
+        title: a.textContent.replace(/\\s+/g, ' ').trim(),
+        href: a.href,
+        sections: sections,
+    };
+})"""
+
+# Sección "Description of key information" del documento abierto
+KEY_INFO_JS = """() => {
+    const keyInfoSection = document.querySelector('section.das-block.KeyInformation');
+    
+    if (!keyInfoSection) {
+        const allSections = document.querySelectorAll('section.das-block');
+        for (const section of allSections) {
+            if (section.querySelector('h3.das-block_label')?.innerText.includes('Description of key information')) {
+                const contentDiv = section.querySelector('.das-field_value_html');
+                if (contentDiv) {
+                    return {
+                        found: true,
+                        content: contentDiv.innerHTML,
+                        textContent: contentDiv.innerText
+                    };
+                }
+            }
+        }
+        return { found: false, error: 'Sección de información clave no encontrada' };
+    }
+    
+    const contentDiv = keyInfoSection.querySelector('.das-field_value_html');
+    if (!contentDiv) {
+        return { found: false, error: 'Div de contenido no encontrado dentro de la sección' };
+    }
+    
+    return {
+        found: true,
+        content: contentDiv.innerHTML,
+        textContent: contentDiv.innerText
+    };
+}"""
+
+
+@asynccontextmanager
+async def nuevo_contexto(pool=None, **context_options):
+    # Con pool reutilizamos un navegador caliente; sin pool (CLI) lanzamos uno propio
+    if pool is not None:
+        async with pool.context(**context_options) as context:
+            yield context
+        return
 
-# Dossier information
-TOXICOLOGY_SECTION = "button[data-toc-target='#id_7_Toxicologicalinformation']"
-TOXICOLOGY_NOAEL = "button[data-toc-target='#id_75_Repeateddosetoxicity']"
+    browser = None
+    try:
+        async with async_playwright() as p:
+            with BROWSER_LAUNCH_DURATION.time():
+                browser = await p.chromium.launch(
+                    headless=True,  # Cambiar a True para evitar problemas de UI en servidor
+                    args=LAUNCH_ARGS  # Argumentos adicionales para Windows
+                )
+            yield await browser.new_context(service_workers="block", **context_options)
+    finally:
+        # Asegurar que el browser se cierre siempre
+        if browser:
+            try:
+                with BROWSER_CLOSE_DURATION.time():
+                    await browser.close()
+                print("Browser cerrado correctamente")
+            except Exception as e:
+                print(f"Error cerrando browser: {str(e)}")
 
 
-async def run(cas_code):
-    browser = None
+def _resultado_inicial(cas_code, scrape_id, checkpoint=None):
     result = {
         "status": "started",
         "cas_code": cas_code,
         "data": None,
-        "message": "Iniciando scraping..."
+        "message": "Iniciando scraping...",
+        "engine": "playwright",
+        "scrape_id": scrape_id,
     }
+    # Registros y huella del intento anterior: si se reanuda después de paso_registros no se vuelven a leer
+    for key in CHECKPOINT_RESULT_KEYS:
+        if checkpoint and key in checkpoint:
+            result[key] = checkpoint[key]
+    return result
+
+
+def reintentable(result):
+    return clase_error(result) in RETRYABLE_ERRORS
+
+
+def nivel_checkpoint(checkpoint):
+    # Paso más profundo desde el que puede reanudar un intento
+    if not checkpoint:
+        return "landing"
+    if checkpoint.get("documents") is not None:
+        return "documents"
+    urls = checkpoint.get("urls") or {}
+    for nivel in ("dossier_frame", "dossier", "registrations", "substance"):
+        if urls.get(nivel):
+            return nivel
+    return "landing"
+
+
+def espera_reintento(intento):
+    # Exponencial con jitter para que los reintentos de un lote no lleguen a la vez
+    espera = min(config.SCRAPE_RETRY_BACKOFF_MAX, config.SCRAPE_RETRY_BACKOFF * 2 ** (intento - 1))
+    return espera * random.uniform(0.5, 1)
+
+
+@timed(FUNCTION_DURATION, function="run")
+async def run(cas_code, pool=None, state_store=None, nav_index=None, on_event=None, artifacts=None, retries=None,
+              asset_cache=None):
+    retries = config.SCRAPE_RETRIES if retries is None else retries
+    state_store = state_store or default_storage_state
+    scrape_id = uuid.uuid4().hex
+    result = _resultado_inicial(cas_code, scrape_id)
+    checkpoint = None
+    intentos = []
+    SCRAPES_IN_FLIGHT.labels(engine="playwright").inc()
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,  # Cambiar a True para evitar problemas de UI en servidor
-                args=['--no-sandbox', '--disable-dev-shm-usage']  # Argumentos adicionales para Windows
-            )
-            context = await browser.new_context()
-            page = await context.new_page()
+        for intento in range(retries + 1):
+            nivel = nivel_checkpoint(checkpoint)
+            if intento:
+                error = intentos[-1]["error"]
+                espera = espera_reintento(intento)
+                print(f"🔁 Reintento {intento}/{retries} de '{cas_code}' ({error}) en {espera:.1f}s, desde '{nivel}'")
+                SCRAPE_RETRIES.labels(error=error, resume_from=nivel).inc()
+                if on_event is not None:
+                    on_event("retry", attempt=intento, error=error, resume_from=nivel, delay_s=round(espera, 2))
+                await asyncio.sleep(espera)
+                result = _resultado_inicial(cas_code, scrape_id, checkpoint)
+
+            # Cada intento en un contexto nuevo, reanudando desde lo que completó el anterior
+            session = await intentar(cas_code, result, pool, state_store, nav_index, on_event, artifacts,
+                                     asset_cache, checkpoint)
+            intentos.append({"attempt": intento + 1, "resumed_from": nivel, "status": result["status"],
+                             "error": clase_error(result)})
+            if not reintentable(result):
+                break
+            checkpoint = session.checkpoint(result)
 
-            # Configurar timeouts más largos
-            page.set_default_timeout(30000)  # 30 segundos
+        if len(intentos) > 1:
+            result["attempts"] = intentos
+        return result
 
-            await page.goto("https://chem.echa.europa.eu/", wait_until="networkidle")
+    finally:
+        SCRAPES_IN_FLIGHT.labels(engine="playwright").dec()
+        registrar_resultado("playwright", result)
 
-            # Esperamos que el label esté visible (asumiendo que es clickeable)
-            await page.wait_for_selector(LABEL_SELECTOR, state="visible")
 
-            checkbox = await page.query_selector(INPUT_SELECTOR)
-            label = await page.query_selector(LABEL_SELECTOR)
+async def intentar(cas_code, result, pool, state_store, nav_index, on_event, artifacts, asset_cache=None,
+                   checkpoint=None):
+    # Un intento completo de run(); devuelve la sesión con lo que se llegó a completar
+    storage_state = state_store.load()
+    upstream = UpstreamThrottle(config.ECHA_BASE_URL)
+    assets = AssetCacheRoute(asset_cache)
+    session = ScrapeSession(cas_code, RequestFilter(), on_event=on_event,
+                            scrape_id=result["scrape_id"], artifacts=artifacts)
+    session.notice_accepted = storage_state is not None
 
-            if not checkbox or not label:
-                result["status"] = "error"
-                result["message"] = "No se encontró el checkbox o el label correspondiente."
-                return result
+    try:
+        async with nuevo_contexto(pool, storage_state=storage_state) as context:
+            # Orden importante: se ejecutan filtro -> caché de recursos -> límite de ECHA
+            # (Playwright prueba primero la última ruta registrada; ver AssetCacheRoute)
+            await upstream.attach(context)
+            await assets.attach(context)
+            await session.request_filter.attach(context)
+            page = await context.new_page()
+            try:
+                await navegar(page, cas_code, result, session, state_store, nav_index, checkpoint)
+            finally:
+                session.finish()
+                if pool is not None:
+                    try:
+                        result["memory"] = await pool.memoria(context, page)
+                    except Exception as e:
+                        print(f"⚠️ No se pudo medir la memoria del navegador: {str(e)}")
+                result["urls"] = dict(session.urls)
+                result["network"] = session.request_filter.report()
+                result["upstream"] = upstream.report()
+                result["asset_cache"] = assets.report()
+                result["readiness"] = session.report()
+                if nav_index is not None and session.urls:
+                    try:
+                        await nav_index.record(cas_code, session.urls)
+                    except Exception as e:
+                        print(f"⚠️ No se pudo actualizar el índice de navegación: {str(e)}")
 
-            is_checked = await checkbox.is_checked()
+    except Exception as e:
+        print(f"Error general durante el scraping: {str(e)}")
+        if isinstance(e, PlaywrightTimeoutError):
+            # Navegación agotada sin capturar (page.goto, clics): ECHA no respondió a tiempo.
+            # Las esperas de disponibilidad con timeout capturado son comprobaciones de ausencia.
+            upstream.observe_timeout()
+        result["status"] = "error"
+        result["message"] = f"Error inesperado: {str(e)}"
 
-            if not is_checked:
-                # Hacemos click en el label para activar el checkbox con Angular
-                await label.click()
-                print("Checkbox marcado correctamente.")
-            else:
-                print("El checkbox ya estaba marcado.")
+    return session
 
-            # Ingresar texto en el input del formulario
-            await page.wait_for_selector(SEARCH_INPUT_SELECTOR, state="visible")
-            input_search = await page.query_selector(SEARCH_INPUT_SELECTOR)
-            button_search = await page.query_selector(SEARCH_BUTTON_SELECTOR)
 
-            if not input_search or not button_search:
-                result["status"] = "error"
-                result["message"] = "No se encontró el input de búsqueda o el botón."
-                return result
+async def huella_registros(registrations_url, pool=None, state_store=None):
+    # Refresco incremental: abre solo la página de registros guardada y calcula su huella.
+    # Sin el aviso legal aceptado no compensa (habría que recorrer la web): devuelve None
+    state_store = state_store or default_storage_state
+    storage_state = state_store.load()
+    if storage_state is None:
+        return None
 
-            await input_search.fill(cas_code)
-            print(f"Ingresado código '{cas_code}' en el campo de búsqueda.")
+    session = ScrapeSession(None, RequestFilter())
+    async with nuevo_contexto(pool, storage_state=storage_state) as context:
+        await UpstreamThrottle(config.ECHA_BASE_URL).attach(context)
+        await session.request_filter.attach(context)
+        rows = await leer_registros(await context.new_page(), session, registrations_url)
+    return huella(filas_pagina(rows)) if rows is not None else None
 
-            # Click en el botón de búsqueda
-            await button_search.click()
-            print("Botón de búsqueda clickeado.")
 
-            # Esperamos que aparezca la tabla o un mensaje de "no results"
-            try:
-                # Esperar resultados (timeout corto para no bloquear si no hay resultados)
-                await page.wait_for_selector(RESULT_ROWS_SELECTOR, timeout=15000)
-            except PlaywrightTimeoutError:
-                result["status"] = "no_results"
-                result["message"] = "No se encontraron resultados para la búsqueda."
-                return result
-
-            # Hay resultados, clicamos el primer enlace
-            first_link = await page.query_selector(FIRST_RESULT_LINK_SELECTOR)
-            if first_link:
-                href = await first_link.get_attribute("href")
-                print(f"Primer resultado encontrado, entrando a: {href}")
-                await first_link.click()
-                # Esperar navegación a la nueva sección
-                await page.wait_for_load_state("networkidle")
-                print("Navegado a la sección del primer resultado.")
-            else:
-                result["status"] = "error"
-                result["message"] = "No se encontró el enlace en la primera fila de resultados."
-                return result
+async def leer_registros(page, session, registrations_url):
+    # Abre directamente la página de registros y lee sus filas; None si la tabla no aparece
+    session.enter("registrations")
+    await page.goto(registrations_url, wait_until="domcontentloaded")
+    try:
+        await readiness.elemento(session, "dossier_table", page, DOSSIER_ROLE_SELECTOR, state="attached",
+                                 timeout=15000)
+    except PlaywrightTimeoutError:
+        return None
+    return await extraction.filas_registro(page, DOSSIER_ROLE_SELECTOR, DOSSIER_LINK_SELECTOR)
 
-            try:
-                # Esperar que aparezca el enlace de REACH registrations
-                await page.wait_for_selector(REACH_LINK_SELECTOR, timeout=15000)
-                reach_label = await page.query_selector(REACH_LINK_SELECTOR)
-
-                if reach_label:
-                    # Subimos al <a> desde el <label> para hacer clic
-                    reach_link = await reach_label.evaluate_handle("node => node.closest('a')")
-                    href = await reach_link.get_attribute("href")
-                    print(f"Entrando al enlace de REACH registrations: {href}")
-                    await reach_link.click()
-                    await page.wait_for_load_state("networkidle")
-                    print("Navegado a la página de REACH registrations.")
-                else:
-                    result["status"] = "error"
-                    result["message"] = "No se encontró el enlace de REACH registrations."
-                    return result
-            except PlaywrightTimeoutError:
-                result["status"] = "error"
-                result["message"] = "El enlace de REACH registrations no apareció a tiempo."
-                return result
 
-            try:
-                print("Esperando la tabla de dosieres...")
-                await page.wait_for_selector(DOSSIER_ROLE_SELECTOR, timeout=15000)
-                role_spans = await page.query_selector_all(DOSSIER_ROLE_SELECTOR)
-
-                lead_found = False
-                for i, span in enumerate(role_spans):
-                    role_text = (await span.inner_text()).strip().lower()
-                    if "lead" in role_text:
-                        print(f"✅ Se encontró un dosier con rol 'Lead' en la fila {i+1}: '{role_text}'")
-                        lead_found = True
-
-                        # Encontramos el <tr> de la fila con rol Lead
-                        row = await span.evaluate_handle("el => el.closest('tr')")
-
-                        # Dentro de esa fila, buscamos el enlace al dossier
-                        dossier_link = await row.query_selector("td[data-cy='dossier-icon'] a")
-
-                        if dossier_link:
-                            href = await dossier_link.get_attribute("href")
-                            print(f"Entrando al dossier tipo Lead en: {href}")
-                            await dossier_link.click()
-                            await page.wait_for_load_state("networkidle")
-                            print("✅ Navegado al dossier tipo Lead correctamente.")
-                            extraction_result = await extraer_info_dossier(page)
-                            result["data"] = extraction_result
-                            break
-                        else:
-                            result["status"] = "error"
-                            result["message"] = "No se encontró el enlace al dossier en la fila con rol Lead."
-                            return result
-
-                if not lead_found:
-                    result["status"] = "error"
-                    result["message"] = "No se encontró ningún dosier con rol 'Lead'."
-                    return result
+def guardar_registros(result, rows):
+    result["registrations"] = [{k: row[k] for k in ("role", "owner", "href")} for row in rows]
+    result["fingerprint"] = huella(filas_pagina(rows))
 
-            except PlaywrightTimeoutError:
-                result["status"] = "error"
-                result["message"] = "La tabla de dosieres no apareció a tiempo."
-                return result
 
-            # Si llegamos aquí, todo fue exitoso
-            result["status"] = "success"
-            result["message"] = "Scraping completado exitosamente"
-            return result
+async def completar_registros(page, cas_code, result, session, nav_index=None):
+    # Se saltó paso_registros (enlace guardado al dossier o reintento reanudado después): sin la
+    # huella el refresco incremental no podría verificar nunca este resultado. La página principal
+    # ya no hace falta, así que se reutiliza para leer la página de registros guardada.
+    # Devuelve True si el Lead ya no es el dossier extraído (la página queda en los registros).
+    registrations_url = session.urls.get("registrations")
+    if not registrations_url and nav_index is not None:
+        registrations_url = (await nav_index.get(cas_code)).get("registrations")
+    if not registrations_url:
+        return False
 
+    try:
+        rows = await leer_registros(page, session, registrations_url)
     except Exception as e:
-        print(f"Error general durante el scraping: {str(e)}")
-        result["status"] = "error"
-        result["message"] = f"Error inesperado: {str(e)}"
-        return result
+        print(f"⚠️ No se pudo leer la página de registros de '{cas_code}': {str(e)}")
+        return False
+    if rows is None:
+        return False
+
+    # Si el Lead ya no es el dossier enlazado, lo extraído es de un dossier antiguo: el enlace
+    # guardado se descarta (también de session.urls, que intentar() vuelve a grabar en el índice)
+    lead = extraction.fila_lead(rows)
+    lead_id = (lead["href"] or "").split("?")[0].rstrip("/").rsplit("/", 1)[-1] if lead else None
+    if not lead_id or lead_id not in session.urls.get("dossier", lead_id):
+        print(f"⚠️ El dossier Lead de '{cas_code}' cambió desde que se guardó el enlace, se descarta")
+        for nivel in ("dossier", "dossier_frame", "document"):
+            session.urls.pop(nivel, None)
+        session.documents = None
+        if nav_index is not None:
+            await nav_index.invalidate(cas_code, "dossier")
+        return True
+    session.urls["registrations"] = registrations_url
+    guardar_registros(result, rows)
+    return False
+
+
+async def buscar_por_url(page, cas_code, session):
+    # Con el aviso ya aceptado vamos directos a la URL de búsqueda.
+    # Devuelve "results", "no_results" o "notice" (el aviso reapareció: el estado caducó)
+    session.enter("search")
+    search_url = config.SEARCH_URL_TEMPLATE.format(base_url=config.ECHA_BASE_URL, cas_code=quote(cas_code))
+    await page.goto(search_url, wait_until="domcontentloaded")
+    print(f"Búsqueda directa: {search_url}")
 
-    finally:
-        # Asegurar que el browser se cierre siempre
-        if browser:
-            try:
-                await browser.close()
-                print("Browser cerrado correctamente")
-            except Exception as e:
-                print(f"Error cerrando browser: {str(e)}")
+    try:
+        await readiness.elemento(
+            session, "search_results", page, f"{RESULT_ROWS_SELECTOR}, {NOTICE_PENDING_SELECTOR}",
+            state="attached", timeout=15000)
+    except PlaywrightTimeoutError:
+        return "no_results"
 
+    busqueda = await extraction.resultados_busqueda(page, RESULT_ROWS_SELECTOR, FIRST_RESULT_LINK_SELECTOR)
+    return "results" if busqueda["count"] else "notice"
 
-async def extraer_info_dossier(page):
-    print("🔍 Intentando acceder al contenido dentro del Shadow DOM e iframe...")
 
-    extraction_data = {
-        "toxicology_accessed": False,
-        "summary_data": None,
-        "error": None
-    }
+async def aceptar_aviso_y_buscar(page, cas_code, result, session, state_store):
+    session.enter("landing")
+    await page.goto(f"{config.ECHA_BASE_URL}/", wait_until="domcontentloaded")
 
-    try:
-        await page.wait_for_selector("iucdas-mod-dossier-view-app", state="attached", timeout=10000)
-        print("✅ Componente iucdas-mod-dossier-view-app encontrado")
-
-        # 2. Acceder al Shadow DOM del componente
-        iframe_src = await page.evaluate("""() => {
-            const hostElement = document.querySelector('iucdas-mod-dossier-view-app');
-            if (!hostElement || !hostElement.shadowRoot) {
-                return null;
-            }
-            
-            const iframe = hostElement.shadowRoot.querySelector('iframe[title="Dossier view"]');
-            return iframe ? iframe.src : null;
-        }""")
+    # Esperamos que el label esté visible (asumiendo que es clickeable)
+    await readiness.elemento(session, "legal_notice", page, LABEL_SELECTOR)
 
-        if not iframe_src:
-            extraction_data["error"] = "No se pudo encontrar el iframe dentro del Shadow DOM"
-            return extraction_data
+    checkbox = await page.query_selector(INPUT_SELECTOR)
+    label = await page.query_selector(LABEL_SELECTOR)
 
-        print(f"✅ URL del iframe encontrada: {iframe_src}")
+    if not checkbox or not label:
+        result["status"] = "error"
+        result["message"] = "No se encontró el checkbox o el label correspondiente."
+        return False
 
-        # 3. Obtener el frame directamente por su URL
-        all_frames = page.frames
-        target_frame = None
+    is_checked = await checkbox.is_checked()
 
-        for frame in all_frames:
-            if frame.url == iframe_src:
-                target_frame = frame
-                print("✅ Frame encontrado por URL")
-                break
+    if not is_checked:
+        # Hacemos click en el label para activar el checkbox con Angular
+        await label.click()
+        print("Checkbox marcado correctamente.")
+    else:
+        print("El checkbox ya estaba marcado.")
+
+    # Ingresar texto en el input del formulario
+    await readiness.elemento(session, "search_form", page, SEARCH_INPUT_SELECTOR)
+    input_search = await page.query_selector(SEARCH_INPUT_SELECTOR)
+    button_search = await page.query_selector(SEARCH_BUTTON_SELECTOR)
 
-        if not target_frame:
-            for frame in all_frames:
-                if iframe_src in frame.url:
-                    target_frame = frame
-                    print(f"✅ Frame encontrado por coincidencia parcial: {frame.url}")
-                    break
+    if not input_search or not button_search:
+        result["status"] = "error"
+        result["message"] = "No se encontró el input de búsqueda o el botón."
+        return False
 
-        if not target_frame and len(all_frames) > 1:
-            target_frame = all_frames[1]
-            print(f"⚠️ Usando frame por índice (1): {target_frame.url}")
+    # Guardamos el estado con el aviso aceptado para los próximos contextos
+    await state_store.save(await page.context.storage_state())
+    session.emit("notice_accepted")
 
-        if not target_frame:
-            extraction_data["error"] = "No se pudo encontrar el frame objetivo"
-            return extraction_data
+    session.enter("search")
+    await input_search.fill(cas_code)
+    print(f"Ingresado código '{cas_code}' en el campo de búsqueda.")
 
-        # 5. Buscar el botón de información toxicológica
-        await target_frame.wait_for_load_state("networkidle")
+    # Click en el botón de búsqueda
+    await button_search.click()
+    print("Botón de búsqueda clickeado.")
+    return True
 
-        try:
-            print(f"🔍 Intentando selector: {TOXICOLOGY_SECTION}")
-            element = await target_frame.query_selector(TOXICOLOGY_SECTION)
-
-            if element:
-                await element.scroll_into_view_if_needed()
-                await target_frame.wait_for_timeout(500)
-                await element.click()
-                print(f"✅ Éxito! Botón encontrado y clicado con selector: {TOXICOLOGY_SECTION}")
-                extraction_data["toxicology_accessed"] = True
-
-                await target_frame.wait_for_timeout(2000)
-
-                # Continuar con la extracción del NOAEL
-                try:
-                    element = await target_frame.query_selector(TOXICOLOGY_NOAEL)
-                    if element:
-                        await element.click()
-                        print(f"✅ Éxito! Botón NOAEL clicado")
-                        await target_frame.wait_for_timeout(2000)
-
-                        # Buscar el enlace del resumen
-                        TOXICOLOGY_NOAEL_SUMMARY = "a.das-leaf.das-docid-IUC5-c5c5dd9c-045f-4d20-a1d4-cd2301d3569a_5f2f0062-0783-425a-a1cb-18b6b744ba6a"
-
-                        summary_link = await target_frame.query_selector(TOXICOLOGY_NOAEL_SUMMARY)
-                        if summary_link:
-                            await summary_link.scroll_into_view_if_needed()
-                            await target_frame.wait_for_timeout(500)
-                            await summary_link.click()
-                            print(f"✅ Enlace de resumen clicado")
-                            await target_frame.wait_for_timeout(2000)
-
-                            # Extraer información del resumen
-                            summary_result = await extraer_info_summary(page, target_frame)
-                            extraction_data["summary_data"] = summary_result
-
-                except Exception as e:
-                    extraction_data["error"] = f"Error en NOAEL: {str(e)}"
-
-        except Exception as e:
-            extraction_data["error"] = f"Error en toxicología: {str(e)}"
 
-    except Exception as e:
-        extraction_data["error"] = f"Error general: {str(e)}"
-        # Capturar screenshot en caso de error
+def _normalizar_url(url):
+    return url.split("#")[0].rstrip("/")
+
+
+async def abrir_enlace_guardado(page, session, url, ready_selector, condition):
+    # Abre una URL del índice de navegación y comprueba que sigue siendo válida.
+    # Devuelve "ok", "invalid" (404, redirección o la página no se pinta) o "notice"
+    response = await page.goto(url, wait_until="domcontentloaded")
+    if response is not None and response.status >= 400:
+        return "invalid"
+
+    try:
+        await readiness.alguno(session, condition, page, [ready_selector, NOTICE_PENDING_SELECTOR], timeout=15000)
+    except PlaywrightTimeoutError:
+        return "invalid"
+
+    if await page.query_selector(NOTICE_PENDING_SELECTOR):
+        return "notice"
+    if _normalizar_url(page.url) != _normalizar_url(url):
+        return "invalid"
+    return "ok"
+
+
+async def saltar_a_enlace_guardado(page, cas_code, session, nav_index, state_store, checkpoint_urls=None):
+    # Salta al enlace guardado más profundo que siga siendo válido. Devuelve el nivel o None.
+    # Las URLs del intento anterior mandan sobre las del índice (son más recientes)
+    guardados = await nav_index.get(cas_code) if nav_index is not None else {}
+    guardados = {**guardados, **(checkpoint_urls or {})}
+    for nivel, ready_selector in DEEP_LINK_READY_SELECTORS:
+        url = guardados.get(nivel)
+        if not url:
+            continue
+
+        session.enter(nivel)
+        print(f"Enlace guardado para '{cas_code}' ({nivel}): {url}")
+        estado = await abrir_enlace_guardado(page, session, url, ready_selector, f"deep_link_{nivel}")
+
+        if estado == "ok":
+            session.urls[nivel] = url
+            session.emit("deep_link", level=nivel, url=url)
+            return nivel
+        if estado == "notice":
+            print("⚠️ El aviso legal reapareció, renovando el estado guardado...")
+            state_store.invalidate()
+            return None
+
+        print(f"⚠️ Enlace guardado no válido ({nivel}), se descarta")
+        if nav_index is not None:
+            await nav_index.invalidate(cas_code, nivel)
+
+    return None
+
+
+async def paso_busqueda(page, cas_code, result, session, state_store):
+    busqueda = None
+    if session.notice_accepted:
+        busqueda = await buscar_por_url(page, cas_code, session)
+        if busqueda == "notice":
+            print("⚠️ El aviso legal reapareció, renovando el estado guardado...")
+            state_store.invalidate()
+            busqueda = None
+
+    if busqueda is None:
+        if not await aceptar_aviso_y_buscar(page, cas_code, result, session, state_store):
+            return False
+
+        # Esperamos que aparezca la tabla o un mensaje de "no results"
         try:
-            await page.screenshot(path="error_toxicology.png")
-        except:
-            pass
+            # Esperar resultados (timeout corto para no bloquear si no hay resultados)
+            await readiness.elemento(session, "search_results", page, RESULT_ROWS_SELECTOR, state="attached", timeout=15000)
+            busqueda = "results"
+        except PlaywrightTimeoutError:
+            busqueda = "no_results"
+
+    if busqueda == "no_results":
+        result["status"] = "no_results"
+        result["message"] = "No se encontraron resultados para la búsqueda."
+        return False
+
+    # Hay resultados, clicamos el primer enlace
+    primero = await extraction.resultados_busqueda(page, RESULT_ROWS_SELECTOR, FIRST_RESULT_LINK_SELECTOR)
+    if primero["href"]:
+        href = primero["href"]
+        session.urls["search"] = page.url
+        session.emit("search_results", url=page.url, href=href, count=primero["count"])
+        print(f"Primer resultado encontrado, entrando a: {href}")
+        session.enter("substance")
+        await page.locator(FIRST_RESULT_LINK_SELECTOR).first.click()
+        print("Navegado a la sección del primer resultado.")
+        return True
+
+    result["status"] = "error"
+    result["message"] = "No se encontró el enlace en la primera fila de resultados."
+    return False
+
+
+async def paso_sustancia(page, result, session):
+    try:
+        # Esperar que aparezca el enlace de REACH registrations
+        await readiness.elemento(session, "reach_link", page, REACH_LINK_SELECTOR, state="attached", timeout=15000)
+        session.urls["substance"] = page.url
+        session.emit("substance_opened", url=page.url)
+        # El <a> que contiene el <label> de REACH registrations
+        reach_link = await extraction.enlace_contenedor(page, REACH_LINK_LABEL_SELECTOR)
+
+        if reach_link:
+            print(f"Entrando al enlace de REACH registrations: {reach_link['href']}")
+            session.enter("registrations")
+            await page.locator(REACH_LINK_SELECTOR).first.click()
+            print("Navegado a la página de REACH registrations.")
+            return True
 
-    return extraction_data
+        result["status"] = "error"
+        result["message"] = "No se encontró el enlace de REACH registrations."
+        return False
+    except PlaywrightTimeoutError:
+        result["status"] = "error"
+        result["message"] = "El enlace de REACH registrations no apareció a tiempo."
+        return False
 
 
-async def extraer_info_summary(page, target_frame):
-    print("🔍 Extrayendo información del resumen toxicológico...")
+async def paso_registros(page, result, session):
+    try:
+        print("Esperando la tabla de dosieres...")
+        await readiness.elemento(session, "dossier_table", page, DOSSIER_ROLE_SELECTOR, state="attached", timeout=15000)
+        session.urls["registrations"] = page.url
+
+        # Todas las filas (rol, titular, enlace) en un solo evaluate
+        rows = await extraction.filas_registro(page, DOSSIER_ROLE_SELECTOR, DOSSIER_LINK_SELECTOR)
+        guardar_registros(result, rows)
+
+        lead = extraction.fila_lead(rows)
+        if lead is None:
+            result["status"] = "error"
+            result["message"] = "No se encontró ningún dosier con rol 'Lead'."
+            return False
+
+        print(f"✅ Se encontró un dosier con rol 'Lead' en la fila {lead['index'] + 1}: '{lead['role']}'")
+        if not lead["href"]:
+            result["status"] = "error"
+            result["message"] = "No se encontró el enlace al dossier en la fila con rol Lead."
+            return False
+
+        print(f"Entrando al dossier tipo Lead en: {lead['href']}")
+        session.emit("lead_dossier_found", row=lead["index"] + 1, href=lead["href"], owner=lead["owner"])
+        session.enter("dossier")
+        # Solo para el click necesitamos el elemento: el enlace de la fila Lead
+        await (page.locator(DOSSIER_ROLE_SELECTOR).nth(lead["index"])
+               .locator("xpath=ancestor::tr[1]").locator(DOSSIER_LINK_SELECTOR).click())
+        print("✅ Navegado al dossier tipo Lead correctamente.")
+        return True
+
+    except PlaywrightTimeoutError:
+        result["status"] = "error"
+        result["message"] = "La tabla de dosieres no apareció a tiempo."
+        return False
+
+
+async def navegar(page, cas_code, result, session, state_store, nav_index=None, checkpoint=None):
+    # Configurar timeouts más largos
+    page.set_default_timeout(30000)  # 30 segundos
+
+    # Reintento: con el iframe del dossier (o el índice del TOC) ya conocidos no hace falta
+    # recorrer la web; extraer_info_dossier reanuda desde ahí
+    checkpoint = checkpoint or {}
+    inicio = None
+    if nivel_checkpoint(checkpoint) in ("documents", "dossier_frame"):
+        session.urls.update(checkpoint["urls"])
+        session.emit("resume", level=nivel_checkpoint(checkpoint))
+        inicio = "dossier"
+
+    # Con el índice de navegación (o las URLs del intento anterior) empezamos en el nivel más profundo
+    if inicio is None and (nav_index is not None or checkpoint.get("urls")) and session.notice_accepted:
+        inicio = await saltar_a_enlace_guardado(page, cas_code, session, nav_index, state_store,
+                                                checkpoint.get("urls"))
+
+    if inicio is None:
+        if not await paso_busqueda(page, cas_code, result, session, state_store):
+            return result
+        inicio = "substance"
 
-    summary_data = {
-        "iframe_found": False,
-        "content_extracted": False,
-        "key_info": None,
+    if inicio == "substance" and not await paso_sustancia(page, result, session):
+        return result
+
+    if inicio in ("substance", "registrations") and not await paso_registros(page, result, session):
+        return result
+
+    result["data"] = await extraer_info_dossier(page, session, checkpoint)
+
+    if "fingerprint" not in result and await completar_registros(page, cas_code, result, session, nav_index):
+        # Lo extraído era del dossier Lead antiguo: desde la página de registros ya abierta se
+        # sigue al Lead actual y se vuelve a extraer
+        if not await paso_registros(page, result, session):
+            return result
+        result["data"] = await extraer_info_dossier(page, session)
+
+    # Si llegamos aquí, todo fue exitoso
+    result["status"] = "success"
+    result["message"] = "Scraping completado exitosamente"
+    return result
+
+
+async def abrir_visor(page, session, frame_url=None):
+    # Devuelve el frame del visor del dossier. En un reintento con su URL ya conocida se abre
+    # directamente como página, sin pasar por la página del dossier ni su Shadow DOM
+    if frame_url:
+        print(f"🔁 Reanudando desde el iframe del dossier: {frame_url}")
+        await page.goto(frame_url, wait_until="domcontentloaded")
+        return page.main_frame
+
+    # 1. Esperar a que el shadow root del visor tenga el iframe "Dossier view" con su src
+    iframe_src = await readiness.iframe_con_src(
+        session, "dossier_iframe", page, readiness.DOSSIER_IFRAME_SELECTOR,
+        host_selector=readiness.DOSSIER_VIEW_HOST, timeout=10000)
+    print(f"✅ URL del iframe encontrada: {iframe_src}")
+    session.urls["dossier"] = page.url
+    session.urls["dossier_frame"] = iframe_src
+    session.emit("lead_dossier_opened", url=page.url)
+
+    # 2. Obtener el frame por su URL en cuanto haya navegado
+    target_frame = await readiness.frame_cargado(session, "dossier_frame", page, iframe_src, timeout=10000)
+    print(f"✅ Frame encontrado: {target_frame.url}")
+    return target_frame
+
+
+@timed(FUNCTION_DURATION, function="extraer_info_dossier")
+async def extraer_info_dossier(page, session=None, checkpoint=None):
+    print("🔍 Intentando acceder al contenido dentro del Shadow DOM e iframe...")
+    session = session or ScrapeSession(None)
+    checkpoint = checkpoint or {}
+
+    extraction_data = {
+        "toxicology_accessed": False,
+        "summary_data": None,
         "error": None
     }
 
     try:
-        await target_frame.wait_for_timeout(2000)
+        documents = checkpoint.get("documents")
+        if documents is None:
+            target_frame = await abrir_visor(page, session, (checkpoint.get("urls") or {}).get("dossier_frame"))
+
+            # 3. Índice del TOC en una sola pasada: sección -> documentos con su URL
+            try:
+                documents = await indice_toc(session, target_frame)
+            except PlaywrightTimeoutError:
+                extraction_data["error"] = "Error en toxicología: el árbol de contenidos no apareció a tiempo"
+                return extraction_data
+            print(f"✅ Índice del TOC: {len(documents)} documentos")
+        else:
+            print(f"🔁 Reanudando con el índice del TOC del intento anterior ({len(documents)} documentos)")
+        session.documents = documents
+        extraction_data["toxicology_accessed"] = any(TOXICOLOGY_SECTION_ID in d["sections"] for d in documents)
+
+        # 4. Los documentos se cargan directamente por URL, sin recorrer el TOC a clicks
+        session.enter("document")
+        noael_document = elegir_resumen(documents, TOXICOLOGY_NOAEL_SECTION_ID)
+        if noael_document is None:
+            extraction_data["error"] = "Error en NOAEL: no se encontró el resumen de toxicidad por dosis repetidas"
+        else:
+            session.urls["document"] = noael_document["href"]
 
-        # Obtener el iframe del documento
-        document_iframe_src = await target_frame.evaluate("""() => {
-            const docIframe = document.querySelector('iframe[title="Document view"][data-cy="das-document-iframe"]');
-            return docIframe ? docIframe.src : null;
-        }""")
+        summaries = await extraer_documentos(page.context, session, documents, noael_document)
+        if noael_document is not None:
+            extraction_data["summary_data"] = summaries[noael_document["href"]]
+        extraction_data["endpoints"] = {
+            section_id: endpoint(doc, doc["href"], summaries[doc["href"]]) if doc
+            else endpoint(error="Sección no encontrada en el árbol de contenidos")
+            for section_id, doc in ((s, elegir_resumen(documents, s)) for s in secciones_configuradas())
+        }
 
-        if not document_iframe_src:
-            summary_data["error"] = "No se pudo encontrar la URL del iframe del documento"
-            return summary_data
+    except PlaywrightTimeoutError:
+        extraction_data["error"] = "No se pudo encontrar el iframe dentro del Shadow DOM"
 
-        summary_data["iframe_found"] = True
-        print(f"✅ Iframe del documento encontrado con URL: {document_iframe_src}")
+    except Exception as e:
+        extraction_data["error"] = f"Error general: {str(e)}"
+        # Capturar screenshot en caso de error
+        if session.artifacts is not None:
+            try:
+                extraction_data["error_screenshot"] = await session.artifacts.put(
+                    await page.screenshot(), session.cas_code, session.scrape_id, "error_screenshot", "image/png")
+            except Exception as screenshot_error:
+                print(f"⚠️ No se pudo guardar la captura de error: {screenshot_error}")
 
-        # Buscar el frame del documento
-        document_frame = None
-        all_frames = page.frames
+    return extraction_data
 
-        for frame in all_frames:
-            if frame.url == document_iframe_src:
-                document_frame = frame
-                break
 
-        if not document_frame:
-            for frame in all_frames:
-                if document_iframe_src in frame.url:
-                    document_frame = frame
-                    break
-
-        if not document_frame:
-            summary_data["error"] = "No se pudo encontrar el iframe del documento"
-            return summary_data
-
-        await document_frame.wait_for_load_state("networkidle")
-        print("🔍 Extrayendo información del resumen desde el iframe del documento...")
-
-        # Extraer la información clave
-        key_info = await document_frame.evaluate("""() => {
-            const keyInfoSection = document.querySelector('section.das-block.KeyInformation');
-            
-            if (!keyInfoSection) {
-                const allSections = document.querySelectorAll('section.das-block');
-                for (const section of allSections) {
-                    if (section.querySelector('h3.das-block_label')?.innerText.includes('Description of key information')) {
-                        const contentDiv = section.querySelector('.das-field_value_html');
-                        if (contentDiv) {
-                            return {
-                                found: true,
-                                content: contentDiv.innerHTML,
-                                textContent: contentDiv.innerText
-                            };
-                        }
-                    }
-                }
-                return { found: false, error: 'Sección de información clave no encontrada' };
-            }
-            
-            const contentDiv = keyInfoSection.querySelector('.das-field_value_html');
-            if (!contentDiv) {
-                return { found: false, error: 'Div de contenido no encontrado dentro de la sección' };
-            }
-            
-            return {
-                found: true,
-                content: contentDiv.innerHTML,
-                textContent: contentDiv.innerText
-            };
-        }""")
-
-        if key_info.get('found'):
-            summary_data["content_extracted"] = True
-            summary_data["key_info"] = {
-                "html_content": key_info.get('content'),
-                "text_content": key_info.get('textContent')
-            }
+async def indice_toc(session, target_frame):
+    # Lee todas las hojas del TOC con un único evaluate (las ocultas también están en el DOM).
+    # Un dossier sin sección 7 no es un error: el TOC se devuelve igual y toxicology_accessed queda False
+    await readiness.elemento(session, "toc_rendered", target_frame, TOC_RENDERED, state="attached", timeout=10000)
+    documents = await target_frame.evaluate(TOC_INDEX_JS)
 
-            # Guardar el HTML (opcional, comentar si no se necesita en API)
-            try:
-                with open("key_info_description.html", "w", encoding="utf-8") as f:
-                    f.write(key_info.get('content', ''))
-                print("💾 HTML guardado en 'key_info_description.html'")
-            except Exception as file_error:
-                print(f"⚠️ No se pudo guardar el archivo: {file_error}")
+    # Si el visor no ha pintado aún las hojas de alguna sección objetivo, se expanden solo esas
+    objetivo = [TOXICOLOGY_NOAEL_SECTION_ID] + secciones_configuradas()
+    pendientes = [s for s in dict.fromkeys(objetivo) if not any(s in d["sections"] for d in documents)]
+    pendientes = [s for s in pendientes if await target_frame.query_selector(TOC_SECTION_BUTTON.format(section_id=s))]
+    if not pendientes:
+        return documents
+
+    if await target_frame.query_selector(TOXICOLOGY_SECTION):
+        await target_frame.click(TOXICOLOGY_SECTION)
+    for section_id in pendientes:
+        await target_frame.click(TOC_SECTION_BUTTON.format(section_id=section_id))
+        try:
+            await readiness.elemento(session, f"toc_{section_id}", target_frame,
+                                     TOC_SECTION_LEAVES.format(section_id=section_id), state="attached", timeout=5000)
+        except PlaywrightTimeoutError:
+            print(f"⚠️ La sección {section_id} no tiene documentos")
+    return await target_frame.evaluate(TOC_INDEX_JS)
 
-        else:
-            summary_data["error"] = key_info.get('error', 'Error desconocido al extraer información')
 
+async def extraer_documento(context, session, condition, document_url):
+    # Abre el documento directamente por su URL en una página nueva y extrae la información clave
+    summary_data = {"iframe_found": False, "content_extracted": False, "key_info": None, "error": None}
+    try:
+        document_page = await context.new_page()
     except Exception as e:
-        summary_data["error"] = f"Error general en extracción de resumen: {str(e)}"
+        summary_data["error"] = f"Error abriendo el documento: {str(e)}"
+        return summary_data
 
+    try:
+        await document_page.goto(document_url, wait_until="domcontentloaded")
+        summary_data["iframe_found"] = True
+        # El contenido está listo cuando se han pintado las secciones del documento
+        await readiness.elemento(session, condition, document_page, readiness.DOCUMENT_SECTION_SELECTOR,
+                                 state="attached", timeout=15000)
+        key_info = await document_page.evaluate(KEY_INFO_JS)
+    except Exception as e:
+        summary_data["error"] = f"Error general en extracción de resumen: {str(e)}"
+        return summary_data
+    finally:
+        await document_page.close()
+
+    if key_info.get("found"):
+        summary_data["content_extracted"] = True
+        summary_data["key_info"] = {
+            "html_content": key_info.get("content"),
+            "text_content": key_info.get("textContent")
+        }
+    else:
+        summary_data["error"] = key_info.get("error", "Error desconocido al extraer información")
     return summary_data
 
 
+@timed(FUNCTION_DURATION, function="extraer_documentos")
+async def extraer_documentos(context, session, documents, noael_document=None):
+    # Resumen NOAEL + un documento por sección configurada, en páginas paralelas del mismo
+    # contexto. Devuelve {url: summary_data}; cada URL se abre una sola vez.
+    objetivos = {}
+    if noael_document is not None:
+        objetivos[noael_document["href"]] = ("document_sections", "summary_extracted", TOXICOLOGY_NOAEL_SECTION_ID)
+    for section_id in secciones_configuradas():
+        document = elegir_resumen(documents, section_id)
+        if document is not None and document["href"] not in objetivos:
+            objetivos[document["href"]] = (f"endpoint_{section_id}", "endpoint_extracted", section_id)
+
+    # La página principal sigue abierta: el resto cabe en el límite de páginas por contexto
+    concurrency = config.ENDPOINT_PAGE_CONCURRENCY
+    if config.BROWSER_MAX_PAGES_PER_CONTEXT:
+        concurrency = min(concurrency, max(1, config.BROWSER_MAX_PAGES_PER_CONTEXT - 1))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def extraer(url, condition, stage, section_id):
+        async with slots:
+            summary = await extraer_documento(context, session, condition, url)
+        if summary["content_extracted"]:
+            session.emit(stage, section_id=section_id, url=url)
+        return summary
+
+    summaries = await asyncio.gather(*(extraer(url, *objetivo) for url, objetivo in objetivos.items()))
+    return dict(zip(objetivos, summaries))
+
+
 if __name__ == "__main__":
     import sys
-    import asyncio
+    import json
+
+    from app.utils.artifact_store import ArtifactStore
 
     # 🛠️ Compatibilidad con Windows
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-    if len(sys.argv) < 2:
-        print("❌ Falta argumento")
+    if len(sys.argv) != 2:
+        # Para listas de CAS (fichero o stdin, con checkpoint): python -m app.services.bulk
+        print("❌ Uso: python -m app.playwright_scrapper.scrapper <CAS>  (varios: python -m app.services.bulk)")
         sys.exit(1)
 
-    asyncio.run(run(sys.argv[1]))
+    async def main(cas_code):
+        # El HTML extraído y las capturas de error quedan en el almacén de artefactos
+        artifacts = ArtifactStore()
+        try:
+            result = await run(cas_code, artifacts=artifacts)
+            await artifacts.externalizar(result)
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+        finally:
+            artifacts.close()
+
+    asyncio.run(main(sys.argv[1]))
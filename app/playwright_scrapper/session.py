@@ -0,0 +1,83 @@
+import time
+import uuid
+
+from app.metrics import STEP_DURATION, WAIT_DURATION
+from app.playwright_scrapper.request_filter import RequestFilter
+
+# Campos del resultado que se conservan entre intentos (los escribe paso_registros)
+CHECKPOINT_RESULT_KEYS = ("registrations", "fingerprint")
+
+
+class ScrapeSession:
+    # Estado de un scrape en curso: paso actual de la navegación, filtro de red y
+    # cuánto se esperó en cada condición de disponibilidad.
+
+    def __init__(self, cas_code, request_filter=None, on_event=None, scrape_id=None, artifacts=None):
+        self.cas_code = cas_code
+        self.scrape_id = scrape_id or uuid.uuid4().hex
+        # ArtifactStore para las capturas de error (None: no se guardan)
+        self.artifacts = artifacts
+        # Callback on_event(stage, **data) para informar del progreso (streaming)
+        self.on_event = on_event
+        self.request_filter = request_filter or RequestFilter(enabled=False)
+        self.step = None
+        self._step_started = None
+        self.steps = {}
+        self.waits = {}
+        # El contexto arrancó con el aviso legal ya aceptado (storage_state guardado)
+        self.notice_accepted = False
+        # URLs visitadas en cada nivel (búsqueda, sustancia, registros, dossier, iframe, documento)
+        self.urls = {}
+        # Índice del TOC del dossier: con él un reintento va directo a los documentos
+        self.documents = None
+
+    def _cerrar_paso(self):
+        if self.step is not None:
+            elapsed = time.monotonic() - self._step_started
+            self.steps[self.step] = round(self.steps.get(self.step, 0) + elapsed * 1000, 1)
+            STEP_DURATION.labels(step=self.step).observe(elapsed)
+
+    def emit(self, stage, **data):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(stage, **data)
+        except Exception as e:
+            print(f"⚠️ Error notificando el evento '{stage}': {str(e)}")
+
+    def enter(self, step):
+        self._cerrar_paso()
+        self.step = step
+        self._step_started = time.monotonic()
+        self.request_filter.set_step(step)
+        self.emit("step", step=step)
+
+    def finish(self):
+        self._cerrar_paso()
+        self.step = None
+
+    async def wait_until(self, condition, awaitable):
+        # Mide el tiempo hasta que se cumple la condición (también si falla por timeout)
+        inicio = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.monotonic() - inicio
+            self.waits[condition] = round(elapsed * 1000, 1)
+            WAIT_DURATION.labels(condition=condition).observe(elapsed)
+
+    def checkpoint(self, result=None):
+        # Lo que necesita el siguiente intento para reanudar desde el último paso completado, más
+        # lo ya leído en pasos que un reintento desde más adelante no vuelve a recorrer
+        checkpoint = {"urls": dict(self.urls), "documents": self.documents}
+        for key in CHECKPOINT_RESULT_KEYS:
+            if result and result.get(key) is not None:
+                checkpoint[key] = result[key]
+        return checkpoint
+
+    def report(self):
+        return {
+            "steps_ms": dict(self.steps),
+            "waits_ms": dict(self.waits),
+            "total_wait_ms": round(sum(self.waits.values()), 1),
+        }
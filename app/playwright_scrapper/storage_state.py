@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+import time
+
+from app import config
+
+
+class StorageStateStore:
+    # Guarda el storage_state de Playwright (cookies/localStorage) después de aceptar el aviso
+    # legal, para que los contextos nuevos empiecen con el aviso aceptado. El fichero se
+    # comparte entre procesos; caduca tras LEGAL_NOTICE_STATE_TTL o cuando el aviso reaparece.
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or config.LEGAL_NOTICE_STATE_PATH
+        self.ttl = config.LEGAL_NOTICE_STATE_TTL if ttl is None else ttl
+        self._state = None
+        self._saved_at = 0
+
+    def _expired(self):
+        return time.time() - self._saved_at > self.ttl
+
+    def load(self):
+        if self._state is None or self._expired():
+            self._state = None
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    stored = json.load(f)
+                self._state = stored["state"]
+                self._saved_at = stored["saved_at"]
+            except (OSError, ValueError, KeyError):
+                return None
+        if self._expired():
+            self._state = None
+            return None
+        return self._state
+
+    def _write(self, stored):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
+
+    async def save(self, state):
+        self._state = state
+        self._saved_at = time.time()
+        try:
+            await asyncio.to_thread(self._write, {"saved_at": self._saved_at, "state": state})
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el estado del aviso legal: {str(e)}")
+
+    def invalidate(self):
+        self._state = None
+        self._saved_at = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+default_store = StorageStateStore()
@@ -0,0 +1,72 @@
+from app.utils.upstream_limiter import default_limiter, host_de
+
+# Peticiones que cuentan contra el ritmo de ECHA: navegaciones y llamadas a la API de la SPA.
+# Scripts y hojas de estilo salen de la caché del navegador casi siempre y no se retienen.
+THROTTLED_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+
+
+class UpstreamThrottle:
+    # Engancha el límite del host de ECHA a un BrowserContext: cada petición espera su token
+    # antes de salir y las respuestas (latencia, 429/5xx, timeouts) ajustan el límite adaptativo.
+    #
+    # Se engancha ANTES que RequestFilter: Playwright ejecuta primero la última ruta registrada,
+    # así que las peticiones bloqueadas por el filtro nunca gastan token y el resto llega aquí
+    # con route.fallback().
+
+    def __init__(self, base_url, limiter=None):
+        self.host = host_de(base_url)
+        self.limiter = (limiter or default_limiter).for_url(base_url)
+        self.requests = 0
+        self.waited_seconds = 0.0
+        self.signals = {"throttled": 0, "error": 0, "timeout": 0}
+
+    def _es_upstream(self, request):
+        return request.resource_type in THROTTLED_RESOURCE_TYPES and host_de(request.url) == self.host
+
+    async def attach(self, context):
+        if self.limiter is None:
+            return
+        await context.route(lambda url: host_de(url) == self.host, self._handle)
+        context.on("requestfinished", self._on_finished)
+        context.on("requestfailed", self._on_failed)
+
+    async def _handle(self, route):
+        if self._es_upstream(route.request):
+            self.requests += 1
+            self.waited_seconds += await self.limiter.acquire()
+        await route.fallback()
+
+    async def _on_finished(self, request):
+        if not self._es_upstream(request):
+            return
+        response = await request.response()
+        if response is None:
+            return
+        # timing: milisegundos desde startTime; -1 si no está disponible
+        response_end = request.timing.get("responseEnd", -1)
+        latency = response_end / 1000 if response_end and response_end > 0 else None
+        if response.status == 429:
+            self.signals["throttled"] += 1
+        elif response.status >= 500:
+            self.signals["error"] += 1
+        self.limiter.observe(latency=latency, status=response.status,
+                             retry_after=response.headers.get("retry-after"))
+
+    def _on_failed(self, request):
+        if self._es_upstream(request) and "TIMED_OUT" in (request.failure or ""):
+            self.signals["timeout"] += 1
+            self.limiter.observe(timeout=True)
+
+    def observe_timeout(self):
+        # Timeout de navegación sin capturar: ECHA no terminó de responder a tiempo
+        if self.limiter is not None:
+            self.signals["timeout"] += 1
+            self.limiter.observe(timeout=True)
+
+    def report(self):
+        return {
+            "enabled": self.limiter is not None,
+            "requests": self.requests,
+            "throttled_wait_ms": round(self.waited_seconds * 1000, 1),
+            **self.signals,
+        }
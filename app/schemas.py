@@ -0,0 +1,17 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from app import config
+
+
+class BatchRequest(BaseModel):
+    cas_codes: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_SIZE)
+    refresh: bool = False
+    # Solo se re-extrae si cambió la huella de los registros; si no, se devuelve lo guardado verificado
+    incremental: bool = False
+
+
+class JobRequest(BaseModel):
+    cas_code: str = Field(..., min_length=1)
+    refresh: bool = False
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from app.services.scrapper_service import ScrapperService, normalizar_cas, resultado_error
+from app.services.sharding import ShardedScrapperService
+
+# Scraping masivo sin pasar por la API: lee CAS de un fichero o de stdin, los scrapea con la
+# concurrencia indicada y escribe cada resultado como una línea NDJSON. El propio fichero de
+# salida es el checkpoint: al relanzar se saltan los CAS que ya tienen resultado.
+#
+#   python -m app.services.bulk cas.txt --output resultados.ndjson --concurrency 8
+#   cat cas.txt | python -m app.services.bulk - --output resultados.ndjson --retry-errors
+#   python -m app.services.bulk cas.txt --output refresco.ndjson --refresh --incremental
+
+FSYNC_INTERVAL = 5
+
+
+def cargar_checkpoint(path, retry_errors=False):
+    # CAS ya terminados según el NDJSON de salida; una última línea a medias se ignora
+    hechos = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if retry_errors and result.get("status") == "error":
+                    hechos.discard(result.get("cas_code"))
+                else:
+                    hechos.add(result.get("cas_code"))
+    except FileNotFoundError:
+        pass
+    return hechos
+
+
+def _codigo(line):
+    return normalizar_cas(line.split("#", 1)[0])
+
+
+def contar_pendientes(path, hechos):
+    if path == "-":
+        return None
+    with open(path, encoding="utf-8") as f:
+        return len({c for c in map(_codigo, f) if c} - hechos)
+
+
+async def leer_codigos(path):
+    # Los CAS se leen de uno en uno: la entrada puede ser stdin o un fichero enorme
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        while True:
+            line = await asyncio.to_thread(f.readline)
+            if not line:
+                return
+            cas_code = _codigo(line)
+            if cas_code:
+                yield cas_code
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class NdjsonWriter:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        # Si una ejecución anterior murió a mitad de línea, empezamos en una línea nueva
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+        self._synced_at = time.monotonic()
+
+    async def write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        if time.monotonic() - self._synced_at > FSYNC_INTERVAL:
+            self._synced_at = time.monotonic()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+class Progreso:
+    def __init__(self, total, saltados):
+        self.total = total
+        self.saltados = saltados
+        self.hechos = 0
+        self.errores = 0
+        self.inicio = time.monotonic()
+
+    def linea(self):
+        elapsed = time.monotonic() - self.inicio
+        ritmo = self.hechos / elapsed * 60 if elapsed > 0 else 0
+        partes = [f"{self.hechos}" + (f"/{self.total}" if self.total is not None else "")]
+        if self.total:
+            partes[0] += f" ({self.hechos * 100 / self.total:.1f}%)"
+        partes.append(f"{ritmo:.1f}/min")
+        if self.total and ritmo > 0:
+            restante = (self.total - self.hechos) / ritmo * 60
+            partes.append(f"ETA {int(restante // 3600)}h{int(restante % 3600 // 60):02d}m{int(restante % 60):02d}s")
+        partes.append(f"errores {self.errores}")
+        if self.saltados:
+            partes.append(f"ya hechos {self.saltados}")
+        return "⏱️ " + " · ".join(partes)
+
+    async def mostrar(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.linea(), file=sys.stderr, flush=True)
+
+
+async def main(args):
+    hechos = cargar_checkpoint(args.output, retry_errors=args.retry_errors)
+    progreso = Progreso(contar_pendientes(args.input, hechos), len(hechos))
+    if hechos:
+        print(f"Reanudando: {len(hechos)} CAS ya tienen resultado en '{args.output}'", file=sys.stderr)
+
+    if args.workers:
+        service = await ShardedScrapperService.create(workers=args.workers)
+    else:
+        service = await ScrapperService.create()
+    writer = NdjsonWriter(args.output)
+    slots = asyncio.Semaphore(args.concurrency)
+    tareas = set()
+    vistos = set(hechos)
+    monitor = asyncio.create_task(progreso.mostrar(args.progress_interval))
+
+    async def uno(cas_code):
+        try:
+            result = await service.scrape(cas_code, refresh=args.refresh, incremental=args.incremental)
+        except Exception as e:
+            result = resultado_error(cas_code, f"Error inesperado: {str(e)}")
+        finally:
+            slots.release()
+        if result.get("status") == "error":
+            progreso.errores += 1
+        await writer.write(result)
+        progreso.hechos += 1
+
+    try:
+        async for cas_code in leer_codigos(args.input):
+            if cas_code in vistos:
+                continue
+            vistos.add(cas_code)
+            await slots.acquire()
+            tarea = asyncio.create_task(uno(cas_code))
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+        await asyncio.gather(*tareas)
+    finally:
+        # Interrumpido o terminado: lo escrito es el checkpoint del próximo arranque
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        monitor.cancel()
+        writer.close()
+        await service.close()
+        print(progreso.linea(), file=sys.stderr)
+
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scraping masivo de CAS con checkpoint en NDJSON")
+    parser.add_argument("input", help="fichero con un CAS por línea, o '-' para stdin")
+    parser.add_argument("--output", required=True, help="fichero NDJSON de resultados (también es el checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="scrapes simultáneos")
+    parser.add_argument("--workers", type=int, default=0, help="procesos worker (modo supervisor)")
+    parser.add_argument("--refresh", action="store_true", help="ignorar la caché de resultados")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-extraer solo si cambió la huella de los registros (refresco periódico)")
+    parser.add_argument("--retry-errors", action="store_true", help="volver a scrapear los CAS que terminaron en error")
+    parser.add_argument("--progress-interval", type=float, default=5, help="segundos entre líneas de progreso")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        sys.exit(asyncio.run(main(parse_args())))
+    except KeyboardInterrupt:
+        print("Interrumpido: se reanudará desde el checkpoint", file=sys.stderr)
+        sys.exit(130)
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow son opcionales: sin pyarrow solo se exporta CSV
+    pa = None
+    pq = None
+
+from app import config
+from app.toxicology import TOXICOLOGY_NOAEL_SECTION_ID, parse_noael, secciones_configuradas
+
+# Exportación columnar de los resultados guardados en la caché (tabla "results"): se leen por
+# bloques en orden de stored_at, se aplanan a columnas y se escriben en CSV, Parquet o Arrow.
+# Cada formato tiene su subdirectorio (<output>/csv, <output>/parquet, <output>/arrow) con su marca
+# de agua en _export_state.json, y cada ejecución solo exporta lo guardado desde la anterior: CSV se
+# añade al mismo fichero, Parquet/Arrow escriben una parte nueva que se lee junto a las demás como
+# un único dataset. Un CAS refrescado vuelve a exportarse: la fila más reciente manda. Con --full se
+# escribe todo en un directorio temporal que sustituye al del formato al terminar.
+#
+#   python -m app.services.export --format parquet --output data/exports
+
+FORMATS = ("csv", "parquet", "arrow")
+STATE_FILE = "_export_state.json"
+
+# (columna, tipo pyarrow)
+BASE_COLUMNS = [
+    ("cas_code", "string"),
+    ("status", "string"),
+    ("engine", "string"),
+    ("scrape_id", "string"),
+    ("message", "string"),
+    ("stored_at", "timestamp"),
+    ("substance_url", "string"),
+    ("registrations_url", "string"),
+    ("dossier_url", "string"),
+    ("document_url", "string"),
+    ("key_info_text", "string"),
+    ("noael_value", "float64"),
+    ("noael_unit", "string"),
+    ("noael_qualifier", "string"),
+    ("noael_all", "string"),
+]
+
+
+def columnas():
+    # Una columna de texto por cada sección toxicológica configurada
+    return BASE_COLUMNS + [(f"key_info_{section_id}", "string") for section_id in secciones_configuradas()]
+
+
+def _texto(summary):
+    return (((summary or {}).get("key_info")) or {}).get("text_content")
+
+
+def fila(cas_code, status, payload, stored_at):
+    result = json.loads(payload)
+    data = result.get("data") or {}
+    urls = result.get("urls") or {}
+    endpoints = data.get("endpoints") or {}
+
+    texto = _texto(data.get("summary_data")) or _texto(endpoints.get(TOXICOLOGY_NOAEL_SECTION_ID))
+    noaels = parse_noael(texto)
+    primero = noaels[0] if noaels else {}
+
+    row = {
+        "cas_code": cas_code,
+        "status": status,
+        "engine": result.get("engine"),
+        "scrape_id": result.get("scrape_id"),
+        "message": result.get("message"),
+        "stored_at": stored_at,
+        "substance_url": urls.get("substance"),
+        "registrations_url": urls.get("registrations"),
+        "dossier_url": urls.get("dossier"),
+        "document_url": urls.get("document"),
+        "key_info_text": texto,
+        "noael_value": primero.get("value"),
+        "noael_unit": primero.get("unit"),
+        "noael_qualifier": primero.get("qualifier"),
+        "noael_all": "; ".join(f"{n['qualifier'] or ''}{n['value']:g} {n['unit']}".strip() for n in noaels) or None,
+    }
+    for section_id in secciones_configuradas():
+        row[f"key_info_{section_id}"] = _texto((endpoints.get(section_id) or {}).get("summary"))
+    return row
+
+
+class _CsvWriter:
+    def __init__(self, output_dir, names):
+        self.path = os.path.join(output_dir, "results.csv")
+        nuevo = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=names)
+        if nuevo:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            stored_at = row["stored_at"]
+            self._writer.writerow({**row, "stored_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stored_at))})
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowWriter:
+    # Parquet: un row group por bloque. Arrow IPC: un record batch por bloque.
+    def __init__(self, output_dir, columns, fmt):
+        types = {"string": pa.string(), "float64": pa.float64(), "timestamp": pa.timestamp("ms", tz="UTC")}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        extension = "parquet" if fmt == "parquet" else "arrow"
+        self.path = os.path.join(output_dir, f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.{extension}")
+        # Con prefijo "." el lector de datasets de pyarrow ignora una parte a medio escribir
+        self._tmp_path = os.path.join(output_dir, f".{os.path.basename(self.path)}.tmp")
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._tmp_path, self.schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(self._tmp_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self.fmt = fmt
+
+    def write(self, rows):
+        batch = pa.RecordBatch.from_pylist(
+            [{**row, "stored_at": int(row["stored_at"] * 1000)} for row in rows], schema=self.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+        if self.fmt != "parquet":
+            self._sink.close()
+        # La parte solo aparece en el dataset cuando está completa
+        os.replace(self._tmp_path, self.path)
+
+
+class ResultExporter:
+    def __init__(self, output_dir=None, fmt="parquet", cache_path=None, chunk_size=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato no soportado: {fmt} ({', '.join(FORMATS)})")
+        if fmt != "csv" and pa is None:
+            raise RuntimeError("pyarrow no está instalado: solo se puede exportar a CSV")
+        self.output_dir = output_dir or config.EXPORT_DIR
+        self.fmt = fmt
+        self.cache_path = cache_path or config.RESULT_CACHE_PATH
+        self.chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+        self.format_dir = os.path.join(self.output_dir, fmt)
+
+    @staticmethod
+    def _leer_estado(directory):
+        try:
+            with open(os.path.join(directory, STATE_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stored_at": 0, "cas_code": ""}
+
+    @staticmethod
+    def _guardar_estado(directory, state):
+        state_path = os.path.join(directory, STATE_FILE)
+        tmp_path = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _sustituir(self, directory):
+        # El directorio anterior se aparta antes de mover el nuevo (rename no pisa directorios con contenido)
+        viejo = f"{self.format_dir}.{os.getpid()}.old"
+        if os.path.exists(self.format_dir):
+            os.replace(self.format_dir, viejo)
+        os.replace(directory, self.format_dir)
+        shutil.rmtree(viejo, ignore_errors=True)
+
+    def _bloques(self, conn, desde):
+        # Paginación por (stored_at, cas_code): memoria acotada a chunk_size filas
+        stored_at, cas_code = desde["stored_at"], desde["cas_code"]
+        while True:
+            rows = conn.execute(
+                "SELECT cas_code, status, payload, stored_at FROM results "
+                "WHERE stored_at > ? OR (stored_at = ? AND cas_code > ?) "
+                "ORDER BY stored_at, cas_code LIMIT ?",
+                (stored_at, stored_at, cas_code, self.chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            stored_at, cas_code = rows[-1][3], rows[-1][0]
+
+    def run(self, full=False):
+        # Exportación completa: directorio nuevo que sustituye al del formato solo al terminar
+        directory = f"{self.format_dir}.{os.getpid()}.tmp" if full else self.format_dir
+        if full:
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        desde = self._leer_estado(directory)
+        conn = sqlite3.connect(f"file:{self.cache_path}?mode=ro", uri=True)
+        inicio = time.monotonic()
+        writer = None
+        exportadas = 0
+        try:
+            for bloque in self._bloques(conn, desde):
+                if writer is None:
+                    columns = columnas()
+                    writer = (_CsvWriter(directory, [name for name, _ in columns]) if self.fmt == "csv"
+                              else _ArrowWriter(directory, columns, self.fmt))
+                writer.write([fila(*row) for row in bloque])
+                exportadas += len(bloque)
+                desde = {"stored_at": bloque[-1][3], "cas_code": bloque[-1][0]}
+                if self.fmt == "csv" and not full:
+                    # CSV ya está en disco: el estado avanza bloque a bloque
+                    self._guardar_estado(directory, desde)
+            if writer is not None:
+                writer.close()
+            if writer is not None or full:
+                self._guardar_estado(directory, desde)
+            if full:
+                self._sustituir(directory)
+        except BaseException:
+            if full:
+                shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            conn.close()
+
+        return {
+            "format": self.fmt,
+            "rows": exportadas,
+            "path": os.path.join(self.format_dir, os.path.basename(writer.path)) if writer else None,
+            "elapsed_seconds": round(time.monotonic() - inicio, 3),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta los resultados guardados a CSV, Parquet o Arrow")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--output", help="directorio de salida (por defecto EXPORT_DIR)")
+    parser.add_argument("--cache", help="base de datos de resultados (por defecto RESULT_CACHE_PATH)")
+    parser.add_argument("--chunk-size", type=int, help="filas por bloque")
+    parser.add_argument("--full", action="store_true", help="exportar todo, ignorando la marca de agua")
+    args = parser.parse_args()
+
+    resumen = ResultExporter(args.output, args.format, args.cache, args.chunk_size).run(full=args.full)
+    print(f"✅ {resumen['rows']} filas exportadas en {resumen['elapsed_seconds']}s -> {resumen['path']}")
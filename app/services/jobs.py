@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+import uuid
+
+from app import config
+from app.metrics import JOBS_QUEUE_DEPTH, JOBS_RUNNING
+from app.utils.sqlite_store import SqliteStore
+
+
+class QueueFull(Exception):
+    def __init__(self, depth):
+        super().__init__(f"Cola de trabajos llena ({depth} pendientes)")
+        self.depth = depth
+
+
+class JobQueue(SqliteStore):
+    # Cola persistente de scrapes. Sobrevive a reinicios: los trabajos que estaban "running"
+    # cuando se cayó el proceso vuelven a "queued" al arrancar.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            cas_code TEXT NOT NULL,
+            refresh INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, path=None, max_queued=None):
+        super().__init__(path or config.JOBS_DB_PATH)
+        self.max_queued = max_queued or config.JOBS_MAX_QUEUED
+
+    async def depth(self):
+        row = await self.execute("SELECT COUNT(*) AS n FROM jobs WHERE status = 'queued'", fetch="one")
+        return row["n"]
+
+    async def enqueue(self, cas_code, refresh=False):
+        depth = await self.depth()
+        if depth >= self.max_queued:
+            raise QueueFull(depth)
+
+        job_id = uuid.uuid4().hex
+        await self.execute(
+            "INSERT INTO jobs (id, cas_code, refresh, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, cas_code, int(refresh), time.time()))
+        return job_id, depth + 1
+
+    async def claim(self):
+        # Toma el trabajo pendiente más antiguo; el UPDATE condicional evita que dos workers
+        # (o dos procesos) se queden con el mismo
+        while True:
+            row = await self.execute(
+                "SELECT id, cas_code, refresh FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1",
+                fetch="one")
+            if row is None:
+                return None
+            claimed = await self.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), row["id"]))
+            if claimed:
+                return {"id": row["id"], "cas_code": row["cas_code"], "refresh": bool(row["refresh"])}
+
+    async def complete(self, job_id, result):
+        await self.execute(
+            "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id))
+
+    async def fail(self, job_id, error):
+        await self.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (error, time.time(), job_id))
+
+    async def get(self, job_id):
+        row = await self.execute("SELECT * FROM jobs WHERE id = ?", (job_id,), fetch="one")
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "cas_code": row["cas_code"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    async def requeue_running(self):
+        return await self.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+
+    async def purge(self, retention=None):
+        limite = time.time() - (retention or config.JOBS_RETENTION)
+        return await self.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (limite,))
+
+
+class JobWorkerPool:
+    # N workers que consumen la cola y ejecutan cada trabajo a través del ScrapperService.
+    # La concurrencia de scrapes queda fijada por el número de workers, no por las conexiones HTTP.
+
+    def __init__(self, queue, service, workers=None, poll_interval=None):
+        self.queue = queue
+        self.service = service
+        self.workers = workers or config.JOBS_WORKERS
+        self.poll_interval = poll_interval or config.JOBS_POLL_INTERVAL
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._stopping = False
+        self.running = 0
+
+    async def start(self):
+        requeued = await self.queue.requeue_running()
+        if requeued:
+            print(f"Reencolados {requeued} trabajos interrumpidos")
+        await self.queue.purge()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _esperar_trabajo(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self, index):
+        while not self._stopping:
+            job = await self.queue.claim()
+            if job is None:
+                await self._esperar_trabajo()
+                continue
+
+            self.running += 1
+            try:
+                result = await self.service.scrape(job["cas_code"], refresh=job["refresh"])
+                await self.queue.complete(job["id"], result)
+            except asyncio.CancelledError:
+                # Al apagar, el trabajo vuelve a la cola en el próximo arranque (requeue_running)
+                raise
+            except Exception as e:
+                print(f"Error en el trabajo {job['id']} ({job['cas_code']}): {str(e)}")
+                await self.queue.fail(job["id"], f"Error inesperado: {str(e)}")
+            finally:
+                self.running -= 1
+
+    async def stats(self):
+        depth = await self.queue.depth()
+        JOBS_QUEUE_DEPTH.set(depth)
+        JOBS_RUNNING.set(self.running)
+        return {"workers": self.workers, "running": self.running, "queue_depth": depth}
@@ -0,0 +1,305 @@
+import asyncio
+import time
+from collections import defaultdict
+
+from app import config
+from app.http_scrapper.scrapper import EndpointChanged, HttpScrapper, RecursoNoEncontrado
+from app.metrics import HTTP_ENGINE_FALLBACKS, INCREMENTAL_CHECKS, clase_error
+from app.playwright_scrapper.browser_pool import BrowserPool
+from app.playwright_scrapper.navigation_index import NavigationIndex
+from app.playwright_scrapper.scrapper import huella_registros, run
+from app.utils.artifact_store import ArtifactStore
+from app.utils.asset_cache import AssetCache
+from app.utils.result_cache import ResultCache, extraccion_completa
+from app.utils.single_flight import SingleFlight
+from app.utils.upstream_limiter import default_limiter
+
+
+# Fallos del motor HTTP que Playwright sí puede resolver: endpoints cambiados (incluidas las
+# respuestas con otra forma, que el motor traduce a EndpointChanged) o un recurso que no está donde
+# se esperaba. Los 429/5xx y timeouts de ECHA no entran: el motor HTTP los devuelve como error y los
+# respeta el limitador. Cualquier otra excepción es un fallo de programación y debe verse.
+HTTP_FALLBACK_ERRORS = (EndpointChanged, RecursoNoEncontrado)
+
+
+def normalizar_cas(cas_code):
+    return cas_code.strip()
+
+
+def deduplicar(cas_codes):
+    # Conserva el orden de llegada y descarta vacíos
+    vistos = []
+    for cas_code in cas_codes:
+        cas_code = normalizar_cas(cas_code)
+        if cas_code and cas_code not in vistos:
+            vistos.append(cas_code)
+    return vistos
+
+
+def resultado_error(cas_code, mensaje):
+    return {"status": "error", "cas_code": cas_code, "data": None, "message": mensaje}
+
+
+class ScrapperService:
+    # Punto único por el que pasan los endpoints: caché de resultados + pool de navegadores
+
+    def __init__(self, pool=None, cache=None, http_engine=None, nav_index=None, artifacts=None,
+                 batch_concurrency=None, asset_cache=None):
+        self.pool = pool
+        self.cache = cache
+        self.nav_index = nav_index
+        # HTML extraído y capturas de error: los resultados solo llevan la referencia
+        self.artifacts = artifacts
+        # JS/CSS/fuentes de ECHA en disco: los navegadores nuevos no los vuelven a descargar
+        self.asset_cache = asset_cache
+        # Motor HTTP sin navegador; si falla o ECHA cambió sus endpoints se usa Playwright
+        self.http_engine = http_engine
+        self.engine_counters = {"http": 0, "playwright": 0, "http_fallbacks": 0, "http_upstream_errors": 0}
+        self.incremental_counters = {"unchanged": 0, "changed": 0, "unverifiable": 0}
+        # Un único límite para todos los lotes: el servidor decide el paralelismo, no el cliente
+        self._batch_slots = asyncio.Semaphore(batch_concurrency or config.BATCH_CONCURRENCY)
+        # Peticiones simultáneas del mismo CAS comparten un único scrape
+        self.single_flight = SingleFlight()
+        # Suscriptores a los eventos de progreso por clave de single-flight (los comparten las peticiones coalescidas)
+        self._listeners = defaultdict(list)
+
+    @classmethod
+    async def create(cls, browser_pool_size=None):
+        # Servicio completo del proceso: navegadores calientes, caché, motor HTTP e índice de navegación
+        pool = BrowserPool(size=browser_pool_size)
+        await pool.start()
+        return cls(pool=pool, cache=ResultCache(), http_engine=HttpScrapper.create(), nav_index=NavigationIndex(),
+                   artifacts=ArtifactStore(), asset_cache=AssetCache() if config.ASSET_CACHE_ENABLED else None)
+
+    async def close(self):
+        await self.single_flight.close()
+        if self.http_engine:
+            await self.http_engine.close()
+        if self.pool:
+            await self.pool.stop()
+        if self.cache:
+            self.cache.close()
+        if self.nav_index:
+            self.nav_index.close()
+        if self.artifacts:
+            self.artifacts.close()
+        if self.asset_cache:
+            self.asset_cache.close()
+
+    def _publicar(self, clave, stage, **data):
+        # Los oyentes van por la misma clave que el single-flight: solo oyen el scrape al que se unieron
+        for listener in list(self._listeners.get(clave, ())):
+            try:
+                listener(stage, **data)
+            except Exception as e:
+                print(f"⚠️ Error notificando el evento '{stage}' de {clave[0]}: {str(e)}")
+
+    async def scrape(self, cas_code, refresh=False, use_cache=True, on_event=None, incremental=False):
+        # refresh: ignora la caché al leer pero guarda el resultado nuevo
+        # use_cache=False: no lee ni escribe la caché
+        # incremental: antes de re-extraer compara la huella de los registros con la del último
+        # resultado guardado (aunque haya caducado); si no cambió lo devuelve marcado como verificado
+        # on_event(stage, **data): recibe los eventos de progreso del scrape
+        cas_code = normalizar_cas(cas_code)
+        # Un refresco incremental puede devolver el resultado guardado: quien pidió un scrape
+        # completo (refresh/no_cache) no debe unirse a él, así que el modo forma parte de la clave
+        modo = "incremental" if incremental and self.cache and use_cache else "full"
+        clave = (cas_code, modo)
+        if on_event is not None:
+            self._listeners[clave].append(on_event)
+
+        try:
+            if self.cache and use_cache and not refresh:
+                cached = await self.cache.get(cas_code)
+                if cached is not None:
+                    if on_event is not None:
+                        on_event("cache_hit", cached_at=cached.get("cached_at"))
+                    return cached
+
+            return await self.single_flight.do(clave, lambda: self._scrape_y_guardar(clave, use_cache))
+        finally:
+            if on_event is not None:
+                self._listeners[clave].remove(on_event)
+                if not self._listeners[clave]:
+                    del self._listeners[clave]
+
+    async def _ejecutar(self, clave):
+        # Cada scrape real ocupa un hueco del límite adaptativo de ECHA (los aciertos de caché no)
+        async with default_limiter.slot(config.ECHA_BASE_URL):
+            return await self._ejecutar_motor(clave)
+
+    async def _ejecutar_motor(self, clave):
+        cas_code = clave[0]
+
+        def on_event(stage, **data):
+            self._publicar(clave, stage, **data)
+
+        if self.http_engine is not None and self.http_engine.available:
+            try:
+                on_event("engine", engine="http")
+                result = await self.http_engine.run(cas_code, on_event=on_event)
+                self.engine_counters["http"] += 1
+                if clase_error(result) == "upstream_error":
+                    self.engine_counters["http_upstream_errors"] += 1
+                return result
+            except HTTP_FALLBACK_ERRORS as e:
+                self.engine_counters["http_fallbacks"] += 1
+                HTTP_ENGINE_FALLBACKS.inc()
+                print(f"⚠️ Motor HTTP falló para {cas_code}: {str(e)}. Usando Playwright...")
+
+        self.engine_counters["playwright"] += 1
+        on_event("engine", engine="playwright")
+        return await run(cas_code, pool=self.pool, nav_index=self.nav_index, artifacts=self.artifacts,
+                         on_event=on_event, asset_cache=self.asset_cache)
+
+    async def _huella_actual(self, cas_code, previo):
+        # Con el mismo motor que produjo el resultado guardado: las huellas solo son comparables así
+        if previo.get("engine") == "http":
+            if self.http_engine is None or not self.http_engine.available:
+                return None
+            return await self.http_engine.huella(cas_code)
+        registrations_url = (previo.get("urls") or {}).get("registrations")
+        if not registrations_url:
+            return None
+        return await huella_registros(registrations_url, pool=self.pool)
+
+    async def _verificar(self, clave):
+        # Refresco incremental: devuelve el resultado guardado verificado o None si hay que re-extraer
+        cas_code = clave[0]
+        previo = await self.cache.peek(cas_code)
+        huella_previa = ((previo or {}).get("fingerprint") or {}).get("hash")
+        if previo is None or not extraccion_completa(previo) or not huella_previa:
+            return None
+
+        try:
+            async with default_limiter.slot(config.ECHA_BASE_URL):
+                actual = await self._huella_actual(cas_code, previo)
+        except Exception as e:
+            print(f"⚠️ No se pudo comprobar la huella de {cas_code}: {str(e)}")
+            actual = None
+
+        if actual is None:
+            outcome = "unverifiable"
+        elif actual["hash"] == huella_previa:
+            outcome = "unchanged"
+        else:
+            outcome = "changed"
+        self.incremental_counters[outcome] += 1
+        INCREMENTAL_CHECKS.labels(outcome=outcome).inc()
+        self._publicar(clave, "fingerprint", outcome=outcome, hash=actual["hash"] if actual else None)
+
+        if outcome == "changed" and self.nav_index is not None:
+            # Puede haber cambiado el dossier Lead: la re-extracción no debe saltar al enlace guardado
+            await self.nav_index.invalidate(cas_code, "dossier")
+        if outcome != "unchanged":
+            return None
+        # Mismos registros y mismo dossier Lead: el resultado guardado sigue valiendo
+        verificado = {**previo, "verified": True, "verified_at": time.time()}
+        await self.cache.set(cas_code, verificado)
+        return verificado
+
+    async def _scrape_y_guardar(self, clave, use_cache):
+        cas_code, modo = clave
+        if modo == "incremental":
+            verificado = await self._verificar(clave)
+            if verificado is not None:
+                return verificado
+
+        result = await self._ejecutar(clave)
+
+        if self.artifacts:
+            try:
+                await self.artifacts.externalizar(result)
+            except Exception as e:
+                print(f"⚠️ No se pudieron guardar los artefactos de {cas_code}: {str(e)}")
+
+        if self.cache and use_cache:
+            try:
+                await self.cache.set(cas_code, result)
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar el resultado en caché: {str(e)}")
+
+        return result
+
+    async def _scrape_en_lote(self, cas_code, refresh, use_cache=True, on_event=None, incremental=False):
+        async with self._batch_slots:
+            try:
+                return await self.scrape(cas_code, refresh=refresh, use_cache=use_cache, on_event=on_event,
+                                         incremental=incremental)
+            except Exception as e:
+                print(f"Error scrapeando {cas_code} en lote: {str(e)}")
+                return resultado_error(cas_code, f"Error inesperado: {str(e)}")
+
+    async def scrape_batch(self, cas_codes, refresh=False, incremental=False):
+        codigos = deduplicar(cas_codes)
+        inicio = time.monotonic()
+
+        resultados = await asyncio.gather(*(self._scrape_en_lote(c, refresh, incremental=incremental)
+                                            for c in codigos))
+
+        elapsed = time.monotonic() - inicio
+        return {
+            "status": "completed",
+            "total": len(codigos),
+            "elapsed_seconds": round(elapsed, 3),
+            "substances_per_minute": round(len(codigos) * 60 / elapsed, 2) if elapsed > 0 else None,
+            "results": dict(zip(codigos, resultados)),
+        }
+
+    async def scrape_stream(self, cas_codes, refresh=False, use_cache=True, incremental=False):
+        # Generador de eventos: progreso de cada CAS y su resultado en cuanto termina,
+        # sin esperar al resto del lote. Un solo CAS no pasa por el semáforo de lotes.
+        codigos = deduplicar(cas_codes)
+        cola = asyncio.Queue()
+        inicio = time.monotonic()
+
+        def evento(event, **data):
+            return {"event": event, "elapsed_ms": round((time.monotonic() - inicio) * 1000, 1), **data}
+
+        async def uno(cas_code):
+            def on_event(stage, **data):
+                cola.put_nowait(evento("stage", cas_code=cas_code, stage=stage, **data))
+
+            if len(codigos) > 1:
+                result = await self._scrape_en_lote(cas_code, refresh, use_cache, on_event, incremental)
+            else:
+                try:
+                    result = await self.scrape(cas_code, refresh=refresh, use_cache=use_cache, on_event=on_event,
+                                               incremental=incremental)
+                except Exception as e:
+                    print(f"Error scrapeando {cas_code} en streaming: {str(e)}")
+                    result = resultado_error(cas_code, f"Error inesperado: {str(e)}")
+            cola.put_nowait(evento("result", cas_code=cas_code, result=result))
+
+        yield evento("accepted", cas_codes=codigos, total=len(codigos))
+        tareas = [asyncio.create_task(uno(c)) for c in codigos]
+        pendientes = len(codigos)
+        try:
+            while pendientes:
+                try:
+                    item = await asyncio.wait_for(cola.get(), timeout=config.STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield evento("heartbeat")
+                    continue
+                if item["event"] == "result":
+                    pendientes -= 1
+                yield item
+
+            elapsed = time.monotonic() - inicio
+            yield evento("done", total=len(codigos), elapsed_seconds=round(elapsed, 3))
+        finally:
+            # Si el cliente se desconecta no seguimos trabajando para él
+            for tarea in tareas:
+                tarea.cancel()
+
+    def stats(self):
+        return {
+            "browser_pool": self.pool.stats() if self.pool else None,
+            "result_cache": self.cache.stats() if self.cache else None,
+            "artifacts": self.artifacts.stats() if self.artifacts else None,
+            "asset_cache": self.asset_cache.stats() if self.asset_cache else None,
+            "single_flight": self.single_flight.stats(),
+            "engines": dict(self.engine_counters),
+            "incremental": dict(self.incremental_counters),
+            "upstream": default_limiter.stats(),
+        }
@@ -0,0 +1,284 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import sys
+import threading
+import time
+
+from app import config
+from app.services.scrapper_service import ScrapperService, normalizar_cas
+from app.utils.artifact_store import ArtifactStore
+from app.utils.metrics import REGISTRY
+from app.utils.upstream_limiter import default_limiter
+
+# Modo supervisor: N procesos worker, cada uno con su event loop, sus navegadores y su caché.
+# El proceso de la API reparte los scrapes por hashing consistente del CAS (el mismo CAS va
+# siempre al mismo worker, con su caché en memoria e índice ya calientes) y recoge los resultados.
+#
+# Protocolo por Pipe (diccionarios picklables):
+#   API -> worker: {"id", "op": "scrape" | "stats" | "metrics", "args": {...}, "events": bool}  /  None = parar
+#   worker -> API: {"id", "event": stage, "data": {...}} | {"id", "result": ...} | {"id", "error": str}
+
+RING_REPLICAS = 100
+# Reinicio de workers caídos con espera exponencial (p. ej. si Chromium no arranca)
+RESTART_MAX_DELAY = 60
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    # Anillo de hashing consistente con nodos virtuales: al cambiar el número de workers
+    # solo se reasigna la fracción de CAS que corresponde al nodo añadido o quitado.
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self._ring = sorted((_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [h for h, _ in self._ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+# --- Proceso worker ---
+
+def _leer_conexion(conn, loop, inbox):
+    # Hilo lector: el Pipe es bloqueante, los mensajes pasan al event loop por la cola
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            msg = None
+        loop.call_soon_threadsafe(inbox.put_nowait, msg)
+        if msg is None:
+            return
+
+
+async def _atender(service, conn, msg):
+    def on_event(stage, **data):
+        conn.send({"id": msg["id"], "event": stage, "data": data})
+
+    try:
+        if msg["op"] == "scrape":
+            result = await service.scrape(**msg["args"], on_event=on_event if msg.get("events") else None)
+        elif msg["op"] == "stats":
+            result = service.stats()
+        elif msg["op"] == "metrics":
+            # Métricas de scrapes, navegadores y limitador de este proceso, con su label shard
+            result = REGISTRY.collect(shard=msg["args"]["shard"])
+        else:
+            raise ValueError(f"Operación desconocida: {msg['op']}")
+        conn.send({"id": msg["id"], "result": result})
+    except Exception as e:
+        print(f"Error en el worker atendiendo {msg.get('args')}: {str(e)}")
+        conn.send({"id": msg["id"], "error": str(e)})
+
+
+async def _servir(index, conn):
+    loop = asyncio.get_running_loop()
+    # El lector arranca antes que los navegadores para que el Pipe no se llene mientras tanto
+    inbox = asyncio.Queue()
+    threading.Thread(target=_leer_conexion, args=(conn, loop, inbox), daemon=True).start()
+    service = await ScrapperService.create(browser_pool_size=config.SHARD_BROWSERS_PER_WORKER)
+    print(f"Worker {index} listo")
+    tareas = set()
+    try:
+        while True:
+            msg = await inbox.get()
+            if msg is None:
+                break
+            tarea = asyncio.create_task(_atender(service, conn, msg))
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        await service.close()
+
+
+def proceso_worker(index, workers, conn):
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    default_limiter.repartir(workers)
+    try:
+        asyncio.run(_servir(index, conn))
+    except KeyboardInterrupt:
+        pass
+
+
+# --- Lado de la API ---
+
+class WorkerProcess:
+    # Un proceso worker visto desde la API: envía peticiones y resuelve sus futures
+    # a medida que llegan las respuestas.
+
+    def __init__(self, index, workers, mp_context):
+        self.index = index
+        self.workers = workers
+        self._mp = mp_context
+        self._pending = {}
+        self._ids = itertools.count()
+        self.process = None
+        self._conn = None
+        self._stopping = False
+        self._started_at = None
+        self._consecutive_crashes = 0
+        self.restarts = 0
+        self._recogida = None
+
+    def start(self, loop):
+        self._loop = loop
+        self._started_at = time.monotonic()
+        self._conn, child_conn = self._mp.Pipe()
+        self.process = self._mp.Process(target=proceso_worker, args=(self.index, self.workers, child_conn),
+                                        name=f"scrapper-worker-{self.index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        threading.Thread(target=self._leer, args=(self._conn,), daemon=True).start()
+
+    def _leer(self, conn):
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._caido, conn)
+                return
+            self._loop.call_soon_threadsafe(self._despachar, msg)
+
+    def _despachar(self, msg):
+        entry = self._pending.get(msg["id"])
+        if entry is None:
+            return
+        future, on_event = entry
+        if "event" in msg:
+            if on_event is not None:
+                on_event(msg["event"], **msg["data"])
+            return
+        del self._pending[msg["id"]]
+        if future.done():
+            return
+        if "error" in msg:
+            future.set_exception(RuntimeError(msg["error"]))
+        else:
+            future.set_result(msg["result"])
+
+    def _caido(self, conn):
+        if self._stopping or conn is not self._conn:
+            return
+        pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"El worker {self.index} terminó inesperadamente"))
+
+        # Levantamos otro proceso con el mismo índice del anillo; si se cae nada más
+        # arrancar esperamos cada vez más para no entrar en un bucle de reinicios
+        if time.monotonic() - self._started_at > RESTART_MAX_DELAY:
+            self._consecutive_crashes = 0
+        delay = min(2 ** self._consecutive_crashes, RESTART_MAX_DELAY)
+        self._consecutive_crashes += 1
+        self.restarts += 1
+        self._recogida = self._loop.create_task(self._recoger(delay))
+
+    async def _recoger(self, delay):
+        # join en un hilo: el proceso puede tardar en salir y no debe bloquear el event loop de la API
+        await asyncio.to_thread(self.process.join, 1)
+        print(f"⚠️ Worker {self.index} caído (exitcode={self.process.exitcode}), reinicio en {delay}s")
+        await asyncio.sleep(delay)
+        self._reiniciar()
+
+    def _reiniciar(self):
+        if not self._stopping:
+            self._conn.close()
+            self.start(self._loop)
+
+    async def call(self, op, args=None, on_event=None):
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (future, on_event)
+        try:
+            self._conn.send({"id": request_id, "op": op, "args": args or {}, "events": on_event is not None})
+        except (BrokenPipeError, OSError):
+            self._pending.pop(request_id, None)
+            raise RuntimeError(f"El worker {self.index} no está disponible")
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def stop(self, timeout=30):
+        if self._stopping or self._conn is None:
+            return
+        self._stopping = True
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        await asyncio.to_thread(self.process.join, timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._conn.close()
+
+
+class ShardedScrapperService(ScrapperService):
+    # Misma interfaz que ScrapperService (scrape, lotes, streaming, stats) pero cada scrape
+    # se ejecuta en el worker que le toca al CAS. La caché y el single-flight viven en los workers.
+
+    def __init__(self, workers=None):
+        self.worker_count = workers or config.SCRAPER_WORKER_PROCESSES
+        # Los workers escriben los artefactos; la API solo los sirve (mismo directorio)
+        super().__init__(artifacts=ArtifactStore(), batch_concurrency=config.BATCH_CONCURRENCY * self.worker_count)
+        mp_context = multiprocessing.get_context("spawn")
+        self.workers = [WorkerProcess(i, self.worker_count, mp_context) for i in range(self.worker_count)]
+        self.ring = HashRing(range(self.worker_count))
+
+    @classmethod
+    async def create(cls, workers=None):
+        service = cls(workers)
+        loop = asyncio.get_running_loop()
+        for worker in service.workers:
+            worker.start(loop)
+        print(f"Supervisor iniciado: {service.worker_count} procesos worker")
+        return service
+
+    async def close(self):
+        await asyncio.gather(*(w.stop() for w in self.workers))
+        self.artifacts.close()
+
+    def worker_for(self, cas_code):
+        return self.workers[self.ring.node_for(normalizar_cas(cas_code))]
+
+    async def scrape(self, cas_code, refresh=False, use_cache=True, on_event=None, incremental=False):
+        cas_code = normalizar_cas(cas_code)
+        args = {"cas_code": cas_code, "refresh": refresh, "use_cache": use_cache, "incremental": incremental}
+        return await self.worker_for(cas_code).call("scrape", args, on_event=on_event)
+
+    async def _stats_worker(self, worker):
+        try:
+            stats = await asyncio.wait_for(worker.call("stats"), timeout=5)
+        except Exception as e:
+            stats = {"error": str(e)}
+        return {"worker": worker.index, "pid": worker.process.pid, "restarts": worker.restarts, **stats}
+
+    async def shard_stats(self):
+        return await asyncio.gather(*(self._stats_worker(w) for w in self.workers))
+
+    async def _metricas_worker(self, worker):
+        try:
+            return await asyncio.wait_for(worker.call("metrics", {"shard": worker.index}), timeout=5)
+        except Exception as e:
+            print(f"⚠️ No se pudieron leer las métricas del worker {worker.index}: {str(e)}")
+            return []
+
+    async def shard_metrics(self):
+        # Los scrapes, navegadores y el limitador viven en los workers: sus registros se unen al de la API
+        return await asyncio.gather(*(self._metricas_worker(w) for w in self.workers))
+
+    def stats(self):
+        return {
+            "workers": [{"worker": w.index, "pid": w.process.pid, "alive": w.process.is_alive(),
+                         "restarts": w.restarts, "in_flight": len(w._pending)} for w in self.workers],
+        }
@@ -0,0 +1,61 @@
+import re
+
+from app import config
+
+# Secciones IUCLID de información toxicológica que se extraen en una misma visita al dossier
+
+TOXICOLOGY_SECTION_ID = "id_7_Toxicologicalinformation"
+TOXICOLOGY_NOAEL_SECTION_ID = "id_75_Repeateddosetoxicity"
+TOXICOLOGY_NOAEL_SUMMARY_DOCID = "IUC5-c5c5dd9c-045f-4d20-a1d4-cd2301d3569a_5f2f0062-0783-425a-a1cb-18b6b744ba6a"
+
+# "NOAEL (oral, rat, 90 d): 50 mg/kg bw/day", "NOAEL = ca. 1,000 ppm", "NOAEL >= 300 mg/kg bw"
+NOAEL_PATTERN = re.compile(
+    r"NOAEL\b(?:\s*\([^)]*\))?[^\d\n(<>=≤≥]{0,40}?\s*[:=]?\s*"
+    r"(?P<qualifier>[<>≤≥]=?|ca\.)?\s*(?P<value>\d+(?:[.,]\d+)*)\s*"
+    r"(?P<unit>(?:[mµu]?g|ppm|ppb|%)(?:\s*/\s*(?:kg|L|m3|m³))?(?:\s*bw)?(?:\s*/\s*(?:day|d))?)",
+    re.IGNORECASE)
+
+
+def _numero(value):
+    # "1,000" y "1.000" como miles; "0,5" como decimal
+    if re.fullmatch(r"\d{1,3}([.,]\d{3})+", value):
+        return float(re.sub(r"[.,]", "", value))
+    return float(value.replace(",", "."))
+
+
+def parse_noael(text):
+    # Todos los NOAEL del texto como [{"value", "unit", "qualifier"}], en orden de aparición
+    return [
+        {"value": _numero(m.group("value")), "unit": " ".join(m.group("unit").split()),
+         "qualifier": m.group("qualifier")}
+        for m in NOAEL_PATTERN.finditer(text or "")
+    ]
+
+
+def secciones_configuradas():
+    # Orden de configuración, sin duplicados
+    return list(dict.fromkeys(config.TOXICOLOGY_ENDPOINTS))
+
+
+def elegir_resumen(documents, section_id):
+    # Documento de una sección: 1) el docid conocido del NOAEL, 2) el "Summary", 3) el primero
+    documents = [d for d in documents if section_id in d.get("sections", [section_id])]
+    if section_id == TOXICOLOGY_NOAEL_SECTION_ID:
+        for doc in documents:
+            if doc["docid"] == TOXICOLOGY_NOAEL_SUMMARY_DOCID:
+                return doc
+    for doc in documents:
+        if "summary" in (doc.get("title") or "").lower():
+            return doc
+    return documents[0] if documents else None
+
+
+def endpoint(doc=None, url=None, summary=None, error=None):
+    # Entrada de result["data"]["endpoints"][section_id]; summary con la forma de summary_data
+    return {
+        "title": doc.get("title") if doc else None,
+        "docid": doc.get("docid") if doc else None,
+        "url": url,
+        "summary": summary,
+        "error": error,
+    }
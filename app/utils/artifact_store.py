@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+import uuid
+
+from app import config
+from app.utils.sqlite_store import SqliteStore
+
+# Tipos que ya vienen comprimidos: no se vuelven a comprimir
+PRECOMPRESSED_TYPES = ("image/png", "image/jpeg", "image/webp", "application/gzip")
+
+
+class ArtifactStore(SqliteStore):
+    # Artefactos de los scrapes (HTML de la información clave, capturas de error) direccionados
+    # por contenido: cada blob se guarda una sola vez bajo su sha256, opcionalmente comprimido,
+    # y cada scrape lo referencia por CAS y scrape_id. La escritura va en un hilo aparte y el
+    # tamaño total en disco se limita borrando los blobs usados hace más tiempo.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            encoding TEXT,
+            content_type TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS artifacts (
+            id TEXT PRIMARY KEY,
+            cas_code TEXT NOT NULL,
+            scrape_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS artifacts_sha256 ON artifacts (sha256);
+        CREATE INDEX IF NOT EXISTS artifacts_scrape ON artifacts (cas_code, scrape_id);
+        CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used_at);
+    """
+
+    def __init__(self, directory=None, max_bytes=None, compress=None):
+        self.directory = directory or config.ARTIFACTS_DIR
+        super().__init__(os.path.join(self.directory, "artifacts.sqlite3"))
+        self.max_bytes = config.ARTIFACTS_MAX_BYTES if max_bytes is None else max_bytes
+        self.compress = config.ARTIFACTS_COMPRESS if compress is None else compress
+        self.stats_counters = {"writes": 0, "deduplicated": 0, "evicted": 0}
+
+    def _blob_path(self, sha256, encoding):
+        return os.path.join(self.directory, "blobs", sha256[:2], sha256 + (".gz" if encoding == "gzip" else ""))
+
+    def _write_blob(self, data, content_type):
+        # En el hilo: hash, compresión y escritura atómica (si el blob ya existe no se reescribe)
+        sha256 = hashlib.sha256(data).hexdigest()
+        encoding = "gzip" if self.compress and content_type not in PRECOMPRESSED_TYPES else None
+        path = self._blob_path(sha256, encoding)
+        if os.path.exists(path):
+            return sha256, path, os.path.getsize(path), encoding, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = gzip.compress(data, mtime=0) if encoding else data
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return sha256, path, len(payload), encoding, True
+
+    async def put(self, data, cas_code, scrape_id, kind, content_type="application/octet-stream"):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        sha256, path, size, encoding, written = await asyncio.to_thread(self._write_blob, data, content_type)
+        now = time.time()
+
+        if written:
+            self.stats_counters["writes"] += 1
+        else:
+            self.stats_counters["deduplicated"] += 1
+        await self.execute(
+            """INSERT INTO blobs (sha256, path, size, encoding, content_type, created_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (sha256) DO UPDATE SET last_used_at = excluded.last_used_at""",
+            (sha256, path, size, encoding, content_type, now, now))
+
+        artifact_id = uuid.uuid4().hex
+        await self.execute(
+            "INSERT INTO artifacts (id, cas_code, scrape_id, kind, sha256, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (artifact_id, cas_code, scrape_id, kind, sha256, now))
+
+        if written and self.max_bytes:
+            await self.enforce_retention()
+
+        return {
+            "artifact_id": artifact_id,
+            "kind": kind,
+            "sha256": sha256,
+            "size": len(data),
+            "content_type": content_type,
+            "url": f"/artifacts/{artifact_id}",
+        }
+
+    async def get(self, artifact_id):
+        # Devuelve (metadatos, contenido descomprimido) o None si no existe o se eliminó por retención
+        row = await self.execute(
+            """SELECT a.id, a.cas_code, a.scrape_id, a.kind, a.created_at, b.sha256, b.path, b.encoding,
+                      b.content_type
+               FROM artifacts a JOIN blobs b ON b.sha256 = a.sha256 WHERE a.id = ?""",
+            (artifact_id,), fetch="one")
+        if row is None:
+            return None
+
+        def _read():
+            with open(row["path"], "rb") as f:
+                payload = f.read()
+            return gzip.decompress(payload) if row["encoding"] == "gzip" else payload
+
+        try:
+            data = await asyncio.to_thread(_read)
+        except OSError:
+            return None
+        return dict(row), data
+
+    async def total_bytes(self):
+        row = await self.execute("SELECT COALESCE(SUM(size), 0) AS total FROM blobs", fetch="one")
+        return row["total"]
+
+    async def enforce_retention(self):
+        # Borra los blobs usados hace más tiempo (y los artefactos que los referencian)
+        # hasta quedar por debajo de max_bytes
+        total = await self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+
+        rows = await self.execute("SELECT sha256, path, size FROM blobs ORDER BY last_used_at", fetch="all")
+        evicted = 0
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            await self.execute("DELETE FROM artifacts WHERE sha256 = ?", (row["sha256"],))
+            await self.execute("DELETE FROM blobs WHERE sha256 = ?", (row["sha256"],))
+            try:
+                await asyncio.to_thread(os.remove, row["path"])
+            except OSError:
+                pass
+            total -= row["size"]
+            evicted += 1
+
+        self.stats_counters["evicted"] += evicted
+        return evicted
+
+    async def externalizar(self, result):
+        # Sustituye el HTML de la información clave del resultado por una referencia al artefacto
+        data = result.get("data") if isinstance(result, dict) else None
+        if not data:
+            return result
+
+        summaries = [("key_info", data.get("summary_data"))]
+        summaries += [(f"key_info_{section_id}", entry.get("summary"))
+                      for section_id, entry in (data.get("endpoints") or {}).items()]
+        scrape_id = result.setdefault("scrape_id", uuid.uuid4().hex)
+
+        for kind, summary in summaries:
+            key_info = (summary or {}).get("key_info") or {}
+            if key_info.get("html_content") is None:
+                continue
+            key_info["html_artifact"] = await self.put(
+                key_info.pop("html_content"), result.get("cas_code"), scrape_id, kind, "text/html; charset=utf-8")
+        return result
+
+    def stats(self):
+        return {**self.stats_counters, "max_bytes": self.max_bytes}
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from app import config
+from app.utils.sqlite_store import SqliteStore
+
+# Nombre con hash de versión (main.3f2a9c1e.js, styles-AB12CD34EF.css): el contenido no cambia nunca
+VERSIONED_URL = re.compile(r"[.\-_][0-9a-fA-F]{8,}\.(js|mjs|css|woff2?|ttf|svg)(\?|$)")
+IMMUTABLE_TTL = 365 * 24 * 3600
+MAX_AGE = re.compile(r"max-age=(\d+)")
+# Cabeceras que se guardan y se devuelven al navegador con el cuerpo cacheado
+STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+
+class AssetCache(SqliteStore):
+    # Caché en disco de los recursos estáticos de ECHA (bundles de Angular, JS/CSS del visor
+    # IUCLID, fuentes), compartida por todos los navegadores y procesos. Cada URL se guarda en
+    # un fichero; mientras está fresca se sirve sin salir a la red y después se revalida con
+    # ETag/Last-Modified. El tamaño total se limita borrando las menos usadas.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS assets (
+            url TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            stored_at REAL NOT NULL,
+            fresh_until REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS assets_last_used ON assets (last_used_at);
+    """
+
+    def __init__(self, directory=None, max_bytes=None, revalidate_after=None):
+        self.directory = directory or config.ASSET_CACHE_DIR
+        super().__init__(os.path.join(self.directory, "assets.sqlite3"))
+        self.max_bytes = config.ASSET_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.revalidate_after = config.ASSET_CACHE_REVALIDATE_AFTER if revalidate_after is None else revalidate_after
+        self.stats_counters = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0,
+                               "bytes_from_cache": 0, "bytes_from_network": 0}
+
+    def _path(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, "files", key[:2], key)
+
+    def _frescura(self, url, headers, now):
+        # Hasta cuándo se puede servir sin revalidar; None si no se debe guardar
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return None
+        if "immutable" in cache_control or VERSIONED_URL.search(url):
+            return now + IMMUTABLE_TTL
+        match = MAX_AGE.search(cache_control)
+        if match and "no-cache" not in cache_control:
+            return now + max(int(match.group(1)), self.revalidate_after)
+        if headers.get("etag") or headers.get("last-modified"):
+            return now + self.revalidate_after
+        # Sin validadores ni frescura no hay forma segura de reutilizarlo
+        return None
+
+    async def get(self, url):
+        row = await self.execute("SELECT * FROM assets WHERE url = ?", (url,), fetch="one")
+        return dict(row) if row is not None else None
+
+    async def read(self, entry):
+        def _read():
+            with open(entry["path"], "rb") as f:
+                return f.read()
+
+        try:
+            return await asyncio.to_thread(_read)
+        except OSError:
+            # El fichero se borró (retención de otro proceso): se trata como ausente
+            await self.execute("DELETE FROM assets WHERE url = ?", (entry["url"],))
+            return None
+
+    def headers(self, entry):
+        return json.loads(entry["headers"])
+
+    async def put(self, url, status, headers, body):
+        headers = {k.lower(): v for k, v in headers.items()}
+        now = time.time()
+        fresh_until = self._frescura(url, headers, now)
+        if fresh_until is None:
+            return False
+
+        path = self._path(url)
+
+        def _write():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(_write)
+        stored = {k: headers[k] for k in STORED_HEADERS if k in headers}
+        await self.execute(
+            """INSERT OR REPLACE INTO assets
+               (url, path, size, status, headers, etag, last_modified, stored_at, fresh_until, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (url, path, len(body), status, json.dumps(stored), headers.get("etag"), headers.get("last-modified"),
+             now, fresh_until, now))
+        self.stats_counters["stored"] += 1
+        if self.max_bytes:
+            await self.enforce_retention()
+        return True
+
+    async def touch(self, entry, revalidated_headers=None):
+        # Uso (acierto) o revalidación con 304: se renueva la frescura con las cabeceras nuevas
+        now = time.time()
+        if revalidated_headers is None:
+            await self.execute("UPDATE assets SET last_used_at = ? WHERE url = ?", (now, entry["url"]))
+            return
+        headers = {**self.headers(entry), **{k.lower(): v for k, v in revalidated_headers.items()}}
+        fresh_until = self._frescura(entry["url"], headers, now) or now + self.revalidate_after
+        await self.execute(
+            "UPDATE assets SET last_used_at = ?, fresh_until = ? WHERE url = ?", (now, fresh_until, entry["url"]))
+
+    def record(self, outcome, size):
+        key = {"hit": "hits", "revalidated": "revalidated", "miss": "misses"}[outcome]
+        self.stats_counters[key] += 1
+        self.stats_counters["bytes_from_network" if outcome == "miss" else "bytes_from_cache"] += size
+
+    async def total_bytes(self):
+        row = await self.execute("SELECT COALESCE(SUM(size), 0) AS total FROM assets", fetch="one")
+        return row["total"]
+
+    async def enforce_retention(self):
+        total = await self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+
+        rows = await self.execute("SELECT url, path, size FROM assets ORDER BY last_used_at", fetch="all")
+        evicted = 0
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            await self.execute("DELETE FROM assets WHERE url = ?", (row["url"],))
+            try:
+                await asyncio.to_thread(os.remove, row["path"])
+            except OSError:
+                pass
+            total -= row["size"]
+            evicted += 1
+
+        self.stats_counters["evicted"] += evicted
+        return evicted
+
+    def stats(self):
+        requests = self.stats_counters["hits"] + self.stats_counters["revalidated"] + self.stats_counters["misses"]
+        served = self.stats_counters["hits"] + self.stats_counters["revalidated"]
+        return {
+            **self.stats_counters,
+            "hit_rate": round(served / requests, 3) if requests else None,
+            "max_bytes": self.max_bytes,
+        }
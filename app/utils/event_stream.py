@@ -0,0 +1,20 @@
+import json
+
+# Serialización de eventos de progreso para respuestas en streaming
+
+
+def formato_sse(evento):
+    if evento["event"] == "heartbeat":
+        # Comentario SSE: mantiene viva la conexión sin generar un evento en el cliente
+        return ": heartbeat\n\n"
+    return f"event: {evento['event']}\ndata: {json.dumps(evento, ensure_ascii=False, default=str)}\n\n"
+
+
+def formato_ndjson(evento):
+    return json.dumps(evento, ensure_ascii=False, default=str) + "\n"
+
+
+FORMATOS = {
+    "sse": ("text/event-stream", formato_sse),
+    "ndjson": ("application/x-ndjson", formato_ndjson),
+}
@@ -0,0 +1,193 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Métricas en memoria con exposición en formato de texto de Prometheus
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120)
+
+
+def _escapar(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in labels) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, **labels):
+        # Familias (nombre, ayuda, tipo, muestras) picklables; los labels extra se añaden a cada
+        # muestra (p. ej. shard="0" en los workers del modo supervisor)
+        extra = tuple((k, str(v)) for k, v in labels.items())
+        return [(m.name, m.documentation, m.TYPE, m.samples(extra)) for m in self._metrics]
+
+    def render(self):
+        return render_families(self.collect())
+
+
+def render_families(*collections):
+    # Une las familias de varios registros (API y workers): cada una con su HELP/TYPE una sola vez
+    families = {}
+    for collection in collections:
+        for name, documentation, metric_type, samples in collection:
+            families.setdefault(name, (documentation, metric_type, []))[2].extend(samples)
+    lines = []
+    for name, (documentation, metric_type, samples) in families.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    TYPE = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        registry.register(self)
+
+    def labels(self, **labels):
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, **labels):
+        # Quita una serie que ya no existe (p. ej. un navegador cerrado)
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        self._children.pop(key, None)
+
+    def _default(self):
+        # Métrica sin labels: se usa como su propio hijo
+        return self.labels()
+
+    def samples(self, extra=()):
+        lines = []
+        for key, child in self._children.items():
+            lines.extend(child.samples(self.name, extra + key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, key):
+        return [f"{name}{_formatear_labels(key)} {self.value}"]
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    @contextmanager
+    def time(self):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - inicio)
+
+    def samples(self, name, key):
+        lines = []
+        acumulado = 0
+        for bound, n in zip(self.buckets, self.counts):
+            acumulado += n
+            lines.append(f"{name}_bucket{_formatear_labels(key + (('le', str(bound)),))} {acumulado}")
+        lines.append(f"{name}_bucket{_formatear_labels(key + (('le', '+Inf'),))} {self.count}")
+        lines.append(f"{name}_sum{_formatear_labels(key)} {self.sum}")
+        lines.append(f"{name}_count{_formatear_labels(key)} {self.count}")
+        return lines
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def timed(histogram, **labels):
+    # Decorador para corrutinas: observa su duración en el histograma
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with histogram.labels(**labels).time():
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+import os
+
+try:
+    import psutil
+except ImportError:  # Sin psutil leemos /proc directamente (solo Linux)
+    psutil = None
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _hijos_proc(pid):
+    hijos = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                hijos.extend(int(p) for p in f.read().split())
+    except OSError:
+        pass
+    return hijos
+
+
+def _rss_proc(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def rss_tree(pid=None):
+    # RSS en bytes de un proceso y todos sus descendientes (p. ej. el driver y los Chromium)
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            procesos = [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for p in procesos:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    total = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        total += _rss_proc(actual)
+        pendientes.extend(_hijos_proc(actual))
+    return total
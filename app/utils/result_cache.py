@@ -0,0 +1,123 @@
+import json
+import time
+from collections import OrderedDict
+
+from app import config
+from app.metrics import RESULT_CACHE_LOOKUPS
+from app.utils.sqlite_store import SqliteStore
+
+
+def extraccion_completa(result):
+    # "success" también cubre extracciones a medias (iframe agotado, resumen sin contenido):
+    # esas no se re-sirven como verificadas, se vuelven a extraer
+    data = result.get("data") or {}
+    summary = data.get("summary_data") or {}
+    return result.get("status") == "success" and not data.get("error") and bool(summary.get("content_extracted"))
+
+
+class ResultCache(SqliteStore):
+    # Caché de dos niveles para los resultados de run(): un LRU en memoria delante de SQLite.
+    # Los resultados "no_results", "error" y las extracciones incompletas se guardan con un TTL más corto
+    # (caché negativa).
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            cas_code TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            stored_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path=None, memory_size=None):
+        super().__init__(path or config.RESULT_CACHE_PATH)
+        self.memory_size = memory_size or config.RESULT_CACHE_MEMORY_SIZE
+        self._memory = OrderedDict()
+        self.stats_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    @staticmethod
+    def ttl_for(result):
+        # Una extracción a medias se guarda como un error: se reintenta pronto en lugar de servirse días
+        if extraccion_completa(result):
+            return config.RESULT_CACHE_TTL
+        if result.get("status") == "no_results":
+            return config.RESULT_CACHE_NO_RESULTS_TTL
+        return config.RESULT_CACHE_ERROR_TTL
+
+    def _remember(self, cas_code, entry):
+        self._memory[cas_code] = entry
+        self._memory.move_to_end(cas_code)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _mark_cached(entry):
+        result = dict(entry["result"])
+        result["cached"] = True
+        result["cached_at"] = entry["stored_at"]
+        return result
+
+    async def get(self, cas_code):
+        now = time.time()
+
+        entry = self._memory.get(cas_code)
+        if entry:
+            if entry["expires_at"] > now:
+                self._memory.move_to_end(cas_code)
+                self.stats_counters["memory_hits"] += 1
+                RESULT_CACHE_LOOKUPS.labels(result="memory_hit").inc()
+                return self._mark_cached(entry)
+            del self._memory[cas_code]
+
+        row = await self.execute(
+            "SELECT payload, stored_at, expires_at FROM results WHERE cas_code = ?",
+            (cas_code,), fetch="one")
+        if row and row["expires_at"] > now:
+            entry = {
+                "result": json.loads(row["payload"]),
+                "stored_at": row["stored_at"],
+                "expires_at": row["expires_at"],
+            }
+            self._remember(cas_code, entry)
+            self.stats_counters["disk_hits"] += 1
+            RESULT_CACHE_LOOKUPS.labels(result="disk_hit").inc()
+            return self._mark_cached(entry)
+
+        self.stats_counters["misses"] += 1
+        RESULT_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    async def set(self, cas_code, result):
+        # Nunca guardamos un resultado a medias
+        if result is None or result.get("status") == "started":
+            return
+
+        stored_at = time.time()
+        entry = {
+            "result": result,
+            "stored_at": stored_at,
+            "expires_at": stored_at + self.ttl_for(result),
+        }
+        self._remember(cas_code, entry)
+        await self.execute(
+            "INSERT OR REPLACE INTO results (cas_code, status, payload, stored_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (cas_code, result.get("status"), json.dumps(result, ensure_ascii=False),
+             entry["stored_at"], entry["expires_at"]))
+        self.stats_counters["writes"] += 1
+
+    async def peek(self, cas_code):
+        # Último resultado guardado aunque haya caducado (refresco incremental); no cuenta como acierto
+        entry = self._memory.get(cas_code)
+        if entry:
+            return dict(entry["result"])
+        row = await self.execute("SELECT payload FROM results WHERE cas_code = ?", (cas_code,), fetch="one")
+        return json.loads(row["payload"]) if row else None
+
+    async def invalidate(self, cas_code):
+        self._memory.pop(cas_code, None)
+        await self.execute("DELETE FROM results WHERE cas_code = ?", (cas_code,))
+
+    def stats(self):
+        return {**self.stats_counters, "memory_entries": len(self._memory)}
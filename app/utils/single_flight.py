@@ -0,0 +1,42 @@
+import asyncio
+
+from app.metrics import SINGLE_FLIGHT_REQUESTS
+
+
+class SingleFlight:
+    # Coalesce llamadas concurrentes con la misma clave: la primera ejecuta el trabajo y
+    # las duplicadas esperan el mismo future y reciben el mismo resultado.
+
+    def __init__(self):
+        self._in_flight = {}
+        self.stats_counters = {"executed": 0, "coalesced": 0}
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def do(self, key, factory):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats_counters["coalesced"] += 1
+            SINGLE_FLIGHT_REQUESTS.labels(outcome="coalesced").inc()
+        else:
+            self.stats_counters["executed"] += 1
+            SINGLE_FLIGHT_REQUESTS.labels(outcome="executed").inc()
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        # shield: si un cliente se desconecta no cancelamos el trabajo del resto
+        return await asyncio.shield(task)
+
+    async def close(self):
+        # Los trabajos van protegidos con shield y sobreviven a sus clientes: al apagar se cancelan
+        # y se esperan antes de cerrar los navegadores y las bases de datos que usan
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {**self.stats_counters, "in_flight": len(self._in_flight)}
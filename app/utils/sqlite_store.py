@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+
+class SqliteStore:
+    # Base para los almacenes persistentes en SQLite. Las consultas se ejecutan en un hilo
+    # aparte (asyncio.to_thread) para no bloquear el event loop.
+
+    SCHEMA = ""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        if self.SCHEMA:
+            with self._lock:
+                self._conn.executescript(self.SCHEMA)
+                self._conn.commit()
+
+    def _execute_sync(self, sql, params=(), fetch=None):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            if fetch == "one":
+                rows = cursor.fetchone()
+            elif fetch == "all":
+                rows = cursor.fetchall()
+            else:
+                rows = cursor.rowcount
+            self._conn.commit()
+            return rows
+
+    async def execute(self, sql, params=(), fetch=None):
+        return await asyncio.to_thread(self._execute_sync, sql, params, fetch)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
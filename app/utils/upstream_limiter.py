@@ -0,0 +1,249 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from app import config
+from app.metrics import UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_IN_FLIGHT, UPSTREAM_QUEUE_DEPTH, UPSTREAM_SIGNALS
+
+# Espera por defecto tras un 429 sin cabecera Retry-After (s)
+DEFAULT_RETRY_AFTER = 1
+# Peso de cada muestra nueva en la media móvil de latencia
+LATENCY_EWMA_ALPHA = 0.2
+# Reducción del límite: fuerte ante errores/timeouts, suave ante latencia alta
+ERROR_DECREASE = 0.5
+SLOW_DECREASE = 0.9
+
+
+def host_de(url):
+    return urlsplit(url).netloc or url
+
+
+def _retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        # También puede venir como fecha HTTP: usamos la espera por defecto
+        return DEFAULT_RETRY_AFTER
+
+
+class TokenBucket:
+    # Ritmo máximo de peticiones: rate tokens por segundo con ráfagas de hasta burst.
+    # pause() vacía el cubo durante un tiempo (Retry-After de un 429).
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _rellenar(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        # El lock mantiene el orden de llegada: nadie se cuela mientras otro espera su token
+        inicio = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._rellenar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        waited = time.monotonic() - inicio
+        self.waited_seconds += waited
+        return waited
+
+
+class HostLimiter:
+    # Límite de un host: cubo de tokens para las peticiones y límite AIMD de scrapes simultáneos.
+    # El límite crece +1 por cada "ventana" de respuestas rápidas (1/limit por respuesta) y se
+    # multiplica por 0.5 ante 429/5xx/timeouts o por 0.9 si la latencia supera el objetivo.
+
+    def __init__(self, host, rate=None, burst=None, initial=None, min_limit=None, max_limit=None,
+                 latency_target=None, decrease_cooldown=None):
+        self.host = host
+        self.bucket = TokenBucket(rate or config.UPSTREAM_RATE, burst or config.UPSTREAM_BURST)
+        self.min_limit = min_limit or config.UPSTREAM_CONCURRENCY_MIN
+        self.max_limit = max_limit or config.UPSTREAM_CONCURRENCY_MAX
+        self.limit = float(initial or config.UPSTREAM_CONCURRENCY_INITIAL)
+        self.latency_target = latency_target or config.UPSTREAM_LATENCY_TARGET
+        self.decrease_cooldown = (config.UPSTREAM_DECREASE_COOLDOWN if decrease_cooldown is None
+                                  else decrease_cooldown)
+        self.in_flight = 0
+        self.latency_ewma = None
+        self._waiters = deque()
+        self._last_decrease = 0
+        self.stats_counters = {"ok": 0, "slow": 0, "throttled": 0, "error": 0, "timeout": 0,
+                               "increases": 0, "decreases": 0}
+        self._publicar_metricas()
+
+    @property
+    def queued(self):
+        return sum(1 for f in self._waiters if not f.done())
+
+    def _publicar_metricas(self):
+        UPSTREAM_CONCURRENCY_LIMIT.labels(host=self.host).set(int(self.limit))
+        UPSTREAM_IN_FLIGHT.labels(host=self.host).set(self.in_flight)
+        UPSTREAM_QUEUE_DEPTH.labels(host=self.host).set(self.queued)
+
+    def _despertar(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        self._publicar_metricas()
+
+    async def _entrar(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._publicar_metricas()
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._publicar_metricas()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Si el hueco ya se había concedido lo devolvemos
+            if future.done() and not future.cancelled():
+                self._salir()
+            else:
+                self._publicar_metricas()
+            raise
+
+    def _salir(self):
+        self.in_flight -= 1
+        self._despertar()
+
+    @asynccontextmanager
+    async def slot(self):
+        # Un scrape contra el host; espera en cola mientras se está en el límite
+        await self._entrar()
+        try:
+            yield
+        finally:
+            self._salir()
+
+    async def acquire(self):
+        # Una petición al host: espera su token
+        return await self.bucket.acquire()
+
+    def _reducir(self, factor):
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        nuevo = max(self.min_limit, self.limit * factor)
+        if nuevo < self.limit:
+            self.stats_counters["decreases"] += 1
+            print(f"⚠️ {self.host}: límite de concurrencia {int(self.limit)} -> {int(nuevo)}")
+        self.limit = nuevo
+        self._publicar_metricas()
+
+    def _aumentar(self):
+        anterior = int(self.limit)
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if int(self.limit) > anterior:
+            self.stats_counters["increases"] += 1
+        # Con más límite entran los que esperaban
+        self._despertar()
+
+    def observe(self, latency=None, status=None, timeout=False, retry_after=None):
+        # Señal de una petición terminada: latencia (s), código HTTP o timeout
+        if timeout:
+            signal = "timeout"
+        elif status == 429:
+            signal = "throttled"
+            self.bucket.pause(_retry_after(retry_after) if retry_after is not None else DEFAULT_RETRY_AFTER)
+        elif status is not None and status >= 500:
+            signal = "error"
+            if retry_after is not None:
+                self.bucket.pause(_retry_after(retry_after))
+        elif latency is not None and latency > self.latency_target:
+            signal = "slow"
+        else:
+            signal = "ok"
+
+        if latency is not None:
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency_ewma)
+        self.stats_counters[signal] += 1
+        UPSTREAM_SIGNALS.labels(host=self.host, signal=signal).inc()
+
+        if signal == "ok":
+            self._aumentar()
+        elif signal == "slow":
+            self._reducir(SLOW_DECREASE)
+        else:
+            self._reducir(ERROR_DECREASE)
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rate_per_second": self.bucket.rate,
+            "tokens": round(min(self.bucket.burst, self.bucket.tokens), 2),
+            "throttled_wait_seconds": round(self.bucket.waited_seconds, 2),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            **self.stats_counters,
+        }
+
+
+class UpstreamLimiter:
+    # Un HostLimiter por host, compartido por todos los scrapes del proceso (ambos motores)
+
+    def __init__(self, enabled=None):
+        self.enabled = config.UPSTREAM_LIMITER_ENABLED if enabled is None else enabled
+        self._hosts = {}
+        self.shares = 1
+
+    def repartir(self, shares):
+        # Modo supervisor: cada worker recibe 1/N del ritmo, la ráfaga y los límites de concurrencia
+        # configurados, de modo que entre todos no superan lo que se fijó para ECHA
+        self.shares = max(1, shares)
+        self._hosts.clear()
+
+    def for_url(self, url):
+        if not self.enabled:
+            return None
+        host = host_de(url)
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            n = self.shares
+            limiter = self._hosts[host] = HostLimiter(
+                host, rate=config.UPSTREAM_RATE / n, burst=max(1, config.UPSTREAM_BURST // n),
+                initial=max(1, config.UPSTREAM_CONCURRENCY_INITIAL // n),
+                min_limit=max(1, config.UPSTREAM_CONCURRENCY_MIN // n),
+                max_limit=max(1, config.UPSTREAM_CONCURRENCY_MAX // n))
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, url):
+        limiter = self.for_url(url)
+        if limiter is None:
+            yield
+            return
+        async with limiter.slot():
+            yield
+
+    def stats(self):
+        return {"enabled": self.enabled, "shares": self.shares, "hosts": {host: l.stats() for host, l in self._hosts.items()}}
+
+
+default_limiter = UpstreamLimiter()
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from app import config
+from app.http_scrapper.scrapper import HttpScrapper
+from app.playwright_scrapper.browser_pool import BrowserPool
+from app.playwright_scrapper.scrapper import run
+from app.playwright_scrapper.storage_state import StorageStateStore
+from app.utils.process_memory import rss_tree
+from app.utils.upstream_limiter import default_limiter
+from benchmarks.mock_echa import serve
+
+# Benchmark del scraper contra el sitio ECHA simulado (benchmarks/mock_echa.py).
+# Mide latencia por paso y extremo a extremo, throughput por nivel de concurrencia y RSS pico.
+#
+#   python -m benchmarks.bench_scrapper --requests 40 --concurrency 1,4,8 --output bench.json
+#   python -m benchmarks.bench_scrapper --baseline bench.json    # falla si hay regresión
+
+
+def percentil(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return round(values[index], 1)
+
+
+def resumen(values):
+    return {
+        "p50": percentil(values, 50),
+        "p95": percentil(values, 95),
+        "p99": percentil(values, 99),
+        "mean": round(statistics.mean(values), 1) if values else None,
+    }
+
+
+class MemorySampler:
+    # Muestrea el RSS del proceso y sus hijos (driver de Playwright y Chromium)
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            self.peak = max(self.peak, rss_tree())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def cas_codes(n, offset=0):
+    return [f"{100 + offset + i}-{(offset + i) % 100:02d}-{(offset + i) % 10}" for i in range(n)]
+
+
+async def medir_nivel(engine, concurrency, codes, scrape):
+    semaforo = asyncio.Semaphore(concurrency)
+    latencias = []
+    pasos = defaultdict(list)
+    estados = defaultdict(int)
+
+    async def uno(cas_code):
+        async with semaforo:
+            inicio = time.monotonic()
+            result = await scrape(cas_code)
+            latencias.append((time.monotonic() - inicio) * 1000)
+            estados[result.get("status")] += 1
+            for step, ms in (result.get("readiness") or {}).get("steps_ms", {}).items():
+                pasos[step].append(ms)
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(uno(c) for c in codes))
+    elapsed = time.monotonic() - inicio
+
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "requests": len(codes),
+        "statuses": dict(estados),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_min": round(len(codes) * 60 / elapsed, 1),
+        "end_to_end_ms": resumen(latencias),
+        "steps_ms": {step: resumen(values) for step, values in pasos.items()},
+    }
+
+
+def comparar(report, baseline, tolerance):
+    # Regresión: p95 más lento o throughput más bajo que la línea base más allá de la tolerancia
+    regresiones = []
+    anteriores = {(r["engine"], r["concurrency"]): r for r in baseline.get("levels", [])}
+    for level in report["levels"]:
+        previo = anteriores.get((level["engine"], level["concurrency"]))
+        if not previo:
+            continue
+        etiqueta = f"{level['engine']} x{level['concurrency']}"
+        p95, p95_prev = level["end_to_end_ms"]["p95"], previo["end_to_end_ms"]["p95"]
+        if p95 and p95_prev and p95 > p95_prev * (1 + tolerance):
+            regresiones.append(f"{etiqueta}: p95 {p95_prev} ms -> {p95} ms")
+        tp, tp_prev = level["throughput_per_min"], previo["throughput_per_min"]
+        if tp < tp_prev * (1 - tolerance):
+            regresiones.append(f"{etiqueta}: throughput {tp_prev}/min -> {tp}/min")
+    peak, peak_prev = report["peak_rss_mb"], baseline.get("peak_rss_mb")
+    if peak_prev and peak > peak_prev * (1 + tolerance):
+        regresiones.append(f"RSS pico {peak_prev} MB -> {peak} MB")
+    return regresiones
+
+
+def imprimir(report):
+    print(f"\n{'motor':<11}{'conc':>5}{'req':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'/min':>9}  estados")
+    for level in report["levels"]:
+        e2e = level["end_to_end_ms"]
+        print(f"{level['engine']:<11}{level['concurrency']:>5}{level['requests']:>6}{e2e['p50']:>10}"
+              f"{e2e['p95']:>10}{e2e['p99']:>10}{level['throughput_per_min']:>9}  {level['statuses']}")
+        for step, stats in level["steps_ms"].items():
+            print(f"    {step:<15} p50={stats['p50']} p95={stats['p95']} ms")
+    print(f"\nRSS pico: {report['peak_rss_mb']} MB")
+
+
+async def main(args):
+    stop_server = await serve(args.port, latency=args.latency, render_delay=args.render_delay)
+    config.ECHA_BASE_URL = f"http://127.0.0.1:{args.port}"
+    # El límite de ritmo hacia ECHA no tiene sentido contra el mock local: mediríamos el cubo de
+    # tokens y no el scraper. Con --upstream-limiter se mide con él activo.
+    default_limiter.enabled = args.upstream_limiter
+
+    sampler = MemorySampler()
+    sampler.start()
+    levels = []
+    pool = None
+    http_engine = None
+    state_dir = tempfile.mkdtemp(prefix="bench_state_")
+
+    try:
+        niveles = [int(c) for c in args.concurrency.split(",")]
+        engines = args.engines.split(",")
+
+        if "playwright" in engines:
+            pool = BrowserPool(size=args.browsers, max_contexts_per_browser=max(niveles))
+            await pool.start()
+            state_store = StorageStateStore(path=os.path.join(state_dir, "state.json"))
+
+            async def scrape_playwright(cas_code):
+                return await run(cas_code, pool=pool, state_store=state_store)
+
+            await scrape_playwright(cas_codes(1, offset=9000)[0])  # calentamiento + aviso legal
+            for i, concurrency in enumerate(niveles):
+                codes = cas_codes(args.requests, offset=i * args.requests)
+                levels.append(await medir_nivel("playwright", concurrency, codes, scrape_playwright))
+
+        if "http" in engines:
+            http_engine = HttpScrapper(base_url=config.ECHA_BASE_URL, record_dir="")
+            for i, concurrency in enumerate(niveles):
+                codes = cas_codes(args.requests, offset=i * args.requests)
+                levels.append(await medir_nivel("http", concurrency, codes, http_engine.run))
+    finally:
+        await sampler.stop()
+        if pool:
+            await pool.stop()
+        if http_engine:
+            await http_engine.close()
+        await stop_server()
+
+    report = {
+        "config": vars(args),
+        "levels": levels,
+        "peak_rss_mb": round(sampler.peak / 1e6, 1),
+    }
+    imprimir(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Informe guardado en '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regresiones = comparar(report, json.load(f), args.tolerance)
+        if regresiones:
+            print("❌ Regresiones respecto a la línea base:")
+            for r in regresiones:
+                print(f"   - {r}")
+            return 1
+        print("✅ Sin regresiones respecto a la línea base")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del scraper contra el sitio ECHA simulado")
+    parser.add_argument("--requests", type=int, default=20, help="scrapes por nivel de concurrencia")
+    parser.add_argument("--concurrency", default="1,4,8", help="niveles de concurrencia separados por comas")
+    parser.add_argument("--engines", default="playwright,http", help="motores a medir: playwright,http")
+    parser.add_argument("--browsers", type=int, default=2, help="navegadores en el pool")
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia artificial por respuesta (s)")
+    parser.add_argument("--render-delay", type=int, default=50, help="retardo de render de la SPA (ms)")
+    parser.add_argument("--port", type=int, default=8950)
+    parser.add_argument("--upstream-limiter", action="store_true",
+                        help="mantener activo el límite de ritmo hacia ECHA (por defecto se desactiva)")
+    parser.add_argument("--output", help="guardar el informe JSON")
+    parser.add_argument("--baseline", help="informe JSON anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="margen de regresión permitido (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    sys.exit(asyncio.run(main(parse_args())))
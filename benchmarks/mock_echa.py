@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+
+# Réplica local de las estructuras de chem.echa.europa.eu de las que depende scrapper.py:
+# aviso legal, formulario de búsqueda, tabla de resultados, tabla de roles de dossier, visor
+# IUCLID con shadow root e iframes "Dossier view"/"Document view" y la sección KeyInformation.
+# También sirve los endpoints JSON que usa el motor HTTP.
+#
+#   python -m benchmarks.mock_echa [puerto] [latencia_servidor_s] [retardo_render_ms]
+#   ECHA_BASE_URL=http://127.0.0.1:8950 python -m app.playwright_scrapper.scrapper 50-00-0
+
+CAS_PATTERN = re.compile(r"^\d{2,7}-\d{2}-\d$")
+
+NOAEL_SUMMARY_DOCID = "IUC5-c5c5dd9c-045f-4d20-a1d4-cd2301d3569a_5f2f0062-0783-425a-a1cb-18b6b744ba6a"
+
+# Secciones toxicológicas del TOC: (id, título, texto del resumen)
+TOX_SECTIONS = [
+    ("id_72_Acutetoxicity", "7.2 Acute Toxicity", "LD50 (oral, rat): 2000 mg/kg bw"),
+    ("id_75_Repeateddosetoxicity", "7.5 Repeated dose toxicity", "NOAEL (oral, rat, 90 d): 50 mg/kg bw/day"),
+    ("id_77_Genetictoxicity", "7.7 Genetic toxicity", "Ames test: negative"),
+    ("id_78_Toxicitytoreproduction", "7.8 Toxicity to reproduction", "NOAEL (developmental, rat): 100 mg/kg bw/day"),
+]
+
+SPA_SCRIPT = """
+<script>
+const RENDER_DELAY = {{render_delay}};
+function accepted() { return localStorage.getItem('legal-notice-accepted') === '1'; }
+function later(fn) { setTimeout(fn, RENDER_DELAY); }
+function notice(container, onAccept) {
+    container.innerHTML = '<input type="checkbox" id="legal-notice"><label for="legal-notice">I accept the legal notice</label>';
+    const checkbox = document.getElementById('legal-notice');
+    checkbox.checked = accepted();
+    checkbox.addEventListener('change', () => {
+        if (checkbox.checked) {
+            localStorage.setItem('legal-notice-accepted', '1');
+            if (onAccept) { onAccept(); }
+        }
+    });
+}
+// Las páginas internas exigen el aviso aceptado, como la SPA real
+function guarded(render) {
+    const app = document.getElementById('app');
+    if (!accepted()) {
+        notice(app, () => location.reload());
+        return;
+    }
+    later(() => render(app));
+}
+</script>
+"""
+
+
+def _page(body, render_delay):
+    script = SPA_SCRIPT.replace("{{render_delay}}", str(render_delay))
+    return HTMLResponse(f"<!doctype html><html><head><meta charset='utf-8'>{script}</head>"
+                        f"<body><div id='app'></div>{body}</body></html>")
+
+
+def _hash(value, n=12):
+    return hashlib.sha1(value.encode()).hexdigest()[:n]
+
+
+def rml_id(cas_code):
+    return f"100.{_hash(cas_code, 3)}.{_hash(cas_code + 'rml', 3)}"
+
+
+def dossier_id(rml):
+    return f"{_hash(rml, 8)}-{_hash(rml + 'a', 4)}-{_hash(rml + 'b', 4)}-{_hash(rml + 'c', 12)}"
+
+
+def docid(section_id, dossier):
+    if section_id == "id_75_Repeateddosetoxicity":
+        return NOAEL_SUMMARY_DOCID
+    return f"IUC5-{_hash(dossier + section_id, 8)}_{_hash(section_id, 8)}"
+
+
+def create_app(latency=0.0, render_delay=50):
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def latencia(request, call_next):
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    # --- Endpoints JSON (motor HTTP y páginas de la SPA) ---
+
+    @app.get("/api-substance/v1/substance")
+    async def api_search(searchText: str = "", pageIndex: int = 1, pageSize: int = 10):
+        cas_code = searchText.strip()
+        if not CAS_PATTERN.match(cas_code):
+            return {"items": [], "state": {"totalItems": 0}}
+        item = {"substanceIndex": {"rmlId": rml_id(cas_code), "rmlCas": cas_code, "rmlName": f"Substance {cas_code}"}}
+        return {"items": [item], "state": {"totalItems": 1}}
+
+    @app.get("/api-dossier-list/v1/dossier")
+    async def api_dossiers(rmlId: str, pageIndex: int = 1, pageSize: int = 100, registrationStatuses: str = ""):
+        lead = {"reachDossierInfo": {"registrationRole": "Lead (joint submission)",
+                                     "assetExternalId": dossier_id(rmlId), "dossierSubtype": "Article 10 - full"}}
+        member = {"reachDossierInfo": {"registrationRole": "Member (joint submission)",
+                                       "assetExternalId": dossier_id(rmlId + "m"), "dossierSubtype": "Article 10 - full"}}
+        lead["reachDossierInfo"]["legalEntityName"] = f"Lead Registrant {rmlId}"
+        member["reachDossierInfo"]["legalEntityName"] = f"Member Registrant {rmlId}"
+        lead["reachDossierInfo"]["lastUpdateDate"] = "2023-05-17"
+        member["reachDossierInfo"]["lastUpdateDate"] = "2021-11-02"
+        return {"items": [member, lead], "state": {"totalItems": 2}}
+
+    # --- Páginas de la SPA ---
+
+    @app.get("/")
+    async def landing():
+        return _page("""
+<form id="search" style="display:none"><input name="searchText"><button type="submit">Search</button></form>
+<script>
+const form = document.getElementById('search');
+later(() => {
+    notice(document.getElementById('app'), () => { form.style.display = ''; });
+    if (accepted()) { form.style.display = ''; }
+});
+form.addEventListener('submit', (e) => {
+    e.preventDefault();
+    location.href = '/substance-search?searchText=' + encodeURIComponent(form.searchText.value);
+});
+</script>""", render_delay)
+
+    @app.get("/substance-search")
+    async def search_page(searchText: str = ""):
+        return _page(f"""
+<script>
+guarded(async (app) => {{
+    const response = await fetch('/api-substance/v1/substance?searchText=' + encodeURIComponent({json.dumps(searchText)}));
+    const data = await response.json();
+    if (!data.items.length) {{ app.innerHTML = '<p class="das-no-results">No results</p>'; return; }}
+    app.innerHTML = '<table>' + data.items.map(i =>
+        '<tr class="das-lib-tr_items"><td><a class="das-strong das-internal" href="/substance/' +
+        i.substanceIndex.rmlId + '">' + i.substanceIndex.rmlName + '</a></td></tr>').join('') + '</table>';
+}});
+</script>""", render_delay)
+
+    @app.get("/substance/{rml}")
+    async def substance_page(rml: str):
+        return _page(f"""
+<script>
+guarded((app) => {{
+    app.innerHTML = '<h1>{rml}</h1><a class="das-widget" href="/substance/{rml}/registrations">' +
+        '<label data-cy="dossierRegistrationCount-label">REACH registrations (2)</label></a>';
+}});
+</script>""", render_delay)
+
+    @app.get("/substance/{rml}/registrations")
+    async def registrations_page(rml: str):
+        return _page(f"""
+<script>
+guarded(async (app) => {{
+    const response = await fetch('/api-dossier-list/v1/dossier?rmlId={rml}');
+    const data = await response.json();
+    app.innerHTML = '<table>' + data.items.map(i =>
+        '<tr><td data-cy="dossier-owner-js-role"><span>' + i.reachDossierInfo.registrationRole + '</span></td>' +
+        '<td data-cy="dossier-owner-js-name">' + i.reachDossierInfo.legalEntityName + '</td>' +
+        '<td data-cy="dossier-last-update-date">' + i.reachDossierInfo.lastUpdateDate + '</td>' +
+        '<td data-cy="dossier-icon"><a href="/dossier/' + i.reachDossierInfo.assetExternalId + '">open</a></td></tr>'
+    ).join('') + '</table>';
+}});
+</script>""", render_delay)
+
+    @app.get("/dossier/{dossier}")
+    async def dossier_page(dossier: str):
+        return _page(f"""
+<script>
+class DossierView extends HTMLElement {{
+    connectedCallback() {{
+        const root = this.attachShadow({{mode: 'open'}});
+        later(() => {{
+            const iframe = document.createElement('iframe');
+            iframe.title = 'Dossier view';
+            iframe.src = '/html-pages-prod/{dossier}/index.html';
+            iframe.style.width = '100%';
+            iframe.style.height = '800px';
+            root.appendChild(iframe);
+        }});
+    }}
+}}
+customElements.define('iucdas-mod-dossier-view-app', DossierView);
+guarded((app) => {{ app.appendChild(document.createElement('iucdas-mod-dossier-view-app')); }});
+</script>""", render_delay)
+
+    # --- Visor de dossiers IUCLID (HTML estático, como html-pages-prod) ---
+
+    @app.get("/html-pages-prod/{dossier}/index.html")
+    async def dossier_viewer(dossier: str):
+        leaves = "".join(
+            f'<li><button data-toc-target="#{sid}">{title}</button><ul hidden>'
+            f'<li><a class="das-leaf das-docid-{docid(sid, dossier)}" href="documents/{docid(sid, dossier)}.html">'
+            f'S-01 | Summary</a></li>'
+            f'<li><a class="das-leaf das-docid-{docid(sid, dossier)}-001" href="documents/{docid(sid, dossier)}-001.html">'
+            f'001 | Key | Experimental result</a></li></ul></li>'
+            for sid, title, _ in TOX_SECTIONS)
+        return HTMLResponse(f"""<!doctype html><html><head><meta charset="utf-8"></head><body>
+<nav class="das-toc"><ul>
+<li><button data-toc-target="#id_1_Generalinformation">1 General information</button><ul hidden></ul></li>
+<li><button data-toc-target="#id_7_Toxicologicalinformation">7 Toxicological information</button><ul hidden>{leaves}</ul></li>
+</ul></nav>
+<iframe title="Document view" data-cy="das-document-iframe" style="width:100%;height:600px"></iframe>
+<script>
+const RENDER_DELAY = {render_delay};
+document.querySelectorAll('button[data-toc-target]').forEach(button => {{
+    button.addEventListener('click', () => setTimeout(() => {{ button.nextElementSibling.hidden = false; }}, RENDER_DELAY));
+}});
+document.querySelectorAll('a.das-leaf').forEach(link => {{
+    link.addEventListener('click', (e) => {{
+        e.preventDefault();
+        setTimeout(() => {{ document.querySelector('iframe[title="Document view"]').src = link.href; }}, RENDER_DELAY);
+    }});
+}});
+</script></body></html>""")
+
+    @app.get("/html-pages-prod/{dossier}/documents/{document}.html")
+    async def dossier_document(dossier: str, document: str):
+        texto = next((t for sid, _, t in TOX_SECTIONS if document.startswith(docid(sid, dossier))), "No data")
+        return HTMLResponse(f"""<!doctype html><html><head><meta charset="utf-8"></head><body>
+<section class="das-block"><h3 class="das-block_label">Administrative data</h3>
+<div class="das-field"><div class="das-field_value_html"><p>Dossier {dossier}</p></div></div></section>
+<section class="das-block KeyInformation"><h3 class="das-block_label">Description of key information</h3>
+<div class="das-field"><div class="das-field_value_html"><p>{texto}</p><p>Document {document}</p></div></div></section>
+</body></html>""")
+
+    return app
+
+
+async def serve(port, latency=0.0, render_delay=50):
+    # Arranca el servidor dentro del event loop actual; devuelve una corrutina para pararlo
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(latency, render_delay), host="127.0.0.1", port=port,
+                                           log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    return stop
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8950
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else float(os.getenv("MOCK_ECHA_LATENCY", "0"))
+    render_delay = int(sys.argv[3]) if len(sys.argv) > 3 else int(os.getenv("MOCK_ECHA_RENDER_DELAY", "50"))
+    uvicorn.run(create_app(latency, render_delay), host="127.0.0.1", port=port)
@@ -1,7 +1,16 @@
 import sys
 import asyncio
-from fastapi import FastAPI, HTTPException
-from app.playwright_scrapper.scrapper import run
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from app import config
+from app.schemas import BatchRequest, JobRequest
+from app.services.jobs import JobQueue, JobWorkerPool, QueueFull
+from app.services.scrapper_service import ScrapperService
+from app.services.sharding import ShardedScrapperService
+from app.utils.event_stream import FORMATOS
+from app.utils.metrics import REGISTRY, render_families
 import platform
 
 print("Running on:", platform.system())
@@ -11,12 +20,35 @@ if sys.platform == "win32":
     # Usar la política ProactorEventLoop en lugar de SelectorEventLoop
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    if config.SCRAPER_WORKER_PROCESSES > 0:
+        # Modo supervisor: los scrapes se reparten entre procesos worker por CAS
+        app.state.scrapper_service = await ShardedScrapperService.create()
+    else:
+        # Navegadores calientes compartidos por todas las peticiones
+        app.state.scrapper_service = await ScrapperService.create()
+    job_queue = JobQueue()
+    app.state.job_queue = job_queue
+    app.state.job_workers = JobWorkerPool(job_queue, app.state.scrapper_service)
+    await app.state.job_workers.start()
+    try:
+        yield
+    finally:
+        await app.state.job_workers.stop()
+        job_queue.close()
+        await app.state.scrapper_service.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/scrapper")
-async def scrapper(cas_code: str):
+async def scrapper(request: Request, cas_code: str, refresh: bool = False, no_cache: bool = False,
+                    incremental: bool = False):
     try:
-        result = await run(cas_code)
+        result = await request.app.state.scrapper_service.scrape(
+            cas_code, refresh=refresh, use_cache=not no_cache, incremental=incremental)
         if result is None:
             return {"status": "completed", "cas_code": cas_code, "message": "Scraping ejecutado"}
         return result
@@ -24,6 +56,91 @@ async def scrapper(cas_code: str):
         print(f"Error en endpoint scrapper: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error durante el scraping: {str(e)}")
 
+@app.post("/scrapper/batch")
+async def scrapper_batch(request: Request, batch: BatchRequest):
+    try:
+        return await request.app.state.scrapper_service.scrape_batch(
+            batch.cas_codes, refresh=batch.refresh, incremental=batch.incremental)
+    except Exception as e:
+        print(f"Error en endpoint scrapper/batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error durante el scraping por lotes: {str(e)}")
+
+def respuesta_stream(eventos, formato):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato} (sse o ndjson)")
+    media_type, serializar = FORMATOS[formato]
+
+    async def cuerpo():
+        async for evento in eventos:
+            yield serializar(evento)
+
+    # Sin caché ni buffering en proxies: cada evento debe llegar en cuanto se produce
+    return StreamingResponse(cuerpo(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/scrapper/stream")
+async def scrapper_stream(request: Request, cas_code: List[str] = Query(...), refresh: bool = False,
+                          no_cache: bool = False, incremental: bool = False, format: str = "sse"):
+    eventos = request.app.state.scrapper_service.scrape_stream(
+        cas_code, refresh=refresh, use_cache=not no_cache, incremental=incremental)
+    return respuesta_stream(eventos, format)
+
+@app.post("/scrapper/batch/stream")
+async def scrapper_batch_stream(request: Request, batch: BatchRequest, format: str = "ndjson"):
+    eventos = request.app.state.scrapper_service.scrape_stream(
+        batch.cas_codes, refresh=batch.refresh, incremental=batch.incremental)
+    return respuesta_stream(eventos, format)
+
+@app.post("/jobs", status_code=202)
+async def crear_job(request: Request, job: JobRequest):
+    try:
+        job_id, depth = await request.app.state.job_queue.enqueue(job.cas_code.strip(), refresh=job.refresh)
+    except QueueFull as e:
+        # Backpressure: el cliente debe reintentar más tarde
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e), "queue_depth": e.depth},
+            headers={"Retry-After": "30"})
+    request.app.state.job_workers.notify()
+    return {"job_id": job_id, "status": "queued", "queue_depth": depth}
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(request: Request, job_id: str):
+    job = await request.app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@app.get("/artifacts/{artifact_id}")
+async def artefacto(request: Request, artifact_id: str):
+    artifacts = request.app.state.scrapper_service.artifacts
+    found = await artifacts.get(artifact_id) if artifacts else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Artefacto no encontrado")
+    meta, data = found
+    return Response(content=data, media_type=meta["content_type"],
+                    headers={"ETag": f'"{meta["sha256"]}"', "Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/stats")
+async def stats(request: Request):
+    service = request.app.state.scrapper_service
+    stats = {**service.stats(), "jobs": await request.app.state.job_workers.stats()}
+    if isinstance(service, ShardedScrapperService):
+        stats["shards"] = await service.shard_stats()
+    return stats
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    # Actualiza los gauges que se calculan bajo demanda (profundidad de la cola)
+    await request.app.state.job_workers.stats()
+    service = request.app.state.scrapper_service
+    if isinstance(service, ShardedScrapperService):
+        # En modo supervisor cada worker aporta sus métricas con el label shard
+        body = render_families(REGISTRY.collect(), *await service.shard_metrics())
+    else:
+        body = REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "SigillumScraper API"}